@@ -1,9 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import numpy as np
-import joblib
 import os
 import random
+import threading
+from utils import wire
+from utils.explain import LeakExplainer, model_version
+from utils.batching import MicroBatcher
+from utils.planning import forecast_demand as simulate_forecast, allocate_water
+from utils import scoring
 
 
 # Initialize Flask app
@@ -11,19 +16,36 @@ app = Flask(__name__)
 CORS(app)
 
 # ------------------------
-# Load Models
+# Load Models (lazily, on first use)
 # ------------------------
-backend_dir = os.path.dirname(os.path.abspath(__file__))
-models_dir = os.path.join(backend_dir, "models")
-
-# Leak detection model
-try:
-    rf_model = joblib.load(os.path.join(models_dir, "leak_detector_rf.pkl"))
-    lr_model = joblib.load(os.path.join(models_dir, "leak_detector_lr.pkl"))
-    print("✅ Models loaded successfully!")
-except Exception as e:
-    rf_model, lr_model = None, None
-    print(f"⚠️ Model loading failed: {e}")
+models_dir = scoring.MODELS_DIR
+
+rf_model, lr_model, rf_explainer = None, None, None
+feature_names = wire.FEATURES  # request fields, in the column order the loaded models expect
+_models_loaded = False
+_models_lock = threading.Lock()
+
+
+def load_models():
+    """Load the leak detection models once, on first use."""
+    global rf_model, lr_model, rf_explainer, feature_names, _models_loaded
+    if _models_loaded:
+        return
+    with _models_lock:
+        if _models_loaded:
+            return
+        try:
+            rf_model, lr_model = scoring.load_models(models_dir)
+            feature_names = scoring.model_features(rf_model, lr_model)
+            rf_path = os.path.join(models_dir, scoring.RF_FILE)
+            rf_explainer = LeakExplainer(rf_model, model_version(rf_path), feature_names)
+            rf_explainer.start_warm_up()
+            print(f"✅ Models loaded successfully! Features: {', '.join(feature_names)}")
+        except Exception as e:
+            rf_model, lr_model, rf_explainer = None, None, None
+            feature_names = wire.FEATURES
+            print(f"⚠️ Model loading failed: {e}")
+        _models_loaded = True
 
 
 
@@ -39,26 +61,93 @@ def home():
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        data = request.get_json()
-        pressure = float(data.get('pressure'))
-        flow = float(data.get('flow'))
-        temperature = float(data.get('temperature'))
-        features = np.array([[pressure, flow, temperature]])
-
-        if rf_model and lr_model:
-            rf_pred = int(rf_model.predict(features)[0])
-            lr_pred = int(lr_model.predict(features)[0])
-            rf_prob = float(rf_model.predict_proba(features)[0][1])
-            lr_prob = float(lr_model.predict_proba(features)[0][1])
+        load_models()
+        row = wire.row_from_json(request.get_json(), feature_names)
+
+        # Concurrent single readings are scored together by the micro-batcher
+        result = batcher.submit(row).result(timeout=PREDICT_TIMEOUT_S)
+
+        return jsonify({name: result[name].item() for name in wire.SCORE_DTYPE.names})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+def score_batch(features):
+    """Run both models over an (n, n_features) matrix; returns a wire.SCORE_DTYPE record array."""
+    load_models()
+    return scoring.score(rf_model, lr_model, features)
+
+
+# Dynamic micro-batching for single-reading /predict traffic
+batcher = MicroBatcher(
+    score_batch,
+    window_ms=float(os.environ.get("BATCH_WINDOW_MS", 2)),
+    max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", 64)),
+)
+PREDICT_TIMEOUT_S = 5.0
+
+
+@app.route('/model/features', methods=['GET'])
+def model_features():
+    load_models()
+    return jsonify({"features": list(feature_names)})
+
+
+@app.route('/metrics/batching', methods=['GET'])
+def batching_metrics():
+    return jsonify(batcher.metrics())
+
+
+# 1️⃣b Batch predict (JSON or binary .npy in, same format out)
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        load_models()
+        if request.mimetype == wire.NPY_CONTENT_TYPE:
+            features = wire.decode_npy(request.get_data(), feature_names)
         else:
-            rf_pred, lr_pred = 0, 0
-            rf_prob, lr_prob = random.uniform(0, 1), random.uniform(0, 1)
+            features = wire.features_from_json(request.get_json(), feature_names)
+
+        results = score_batch(features)
+
+        if wire.wants_npy(request.mimetype, request.headers.get('Accept')):
+            return Response(wire.encode_results(results), mimetype=wire.NPY_CONTENT_TYPE)
+        return jsonify(wire.results_to_json(results))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
+
+# 1️⃣c Explain flagged readings (RandomForest TreeSHAP, cached, latency-bounded)
+@app.route('/explain', methods=['POST'])
+def explain():
+    try:
+        load_models()
+        if rf_explainer is None:
+            return jsonify({"error": "RandomForest model not loaded"}), 503
+
+        if request.mimetype == wire.NPY_CONTENT_TYPE:
+            features = wire.decode_npy(request.get_data(), feature_names)
+        else:
+            features = wire.features_from_json(request.get_json(), feature_names)
+        budget_ms = float(request.args.get('budget_ms', 50))
+        explain_all = request.args.get('all', 'false').lower() == 'true'
+
+        results = score_batch(features)
+        probs = results["RandomForest_Leak_Probability"]
+        if explain_all:
+            idx = np.arange(len(features))
+        else:
+            idx = np.flatnonzero(results["RandomForest_Prediction"] == 1)
+
+        explanations = rf_explainer.explain(features[idx], probs[idx], budget_ms=budget_ms)
         return jsonify({
-            "RandomForest_Prediction": rf_pred,
-            "RandomForest_Leak_Probability": rf_prob,
-            "LogisticRegression_Prediction": lr_pred,
-            "LogisticRegression_Leak_Probability": lr_prob
+            "model_version": rf_explainer.version,
+            "explanations": [
+                {"index": int(i), "RandomForest_Leak_Probability": float(probs[i]), **e}
+                for i, e in zip(idx, explanations)
+            ]
         })
 
     except Exception as e:
@@ -74,12 +163,7 @@ def forecast_demand():
         avg_flow = float(data.get('avg_flow', 100))
         temperature = float(data.get('temperature', 25))
 
-            # simple simulated model — could later be replaced with ARIMA/LSTM model
-        forecast = []
-        for d in range(1, days + 1):
-            fluctuation = random.uniform(-5, 5)
-            demand = round(avg_flow + (temperature * 0.2) + fluctuation, 2)
-            forecast.append({"day": d, "predicted_demand_L": demand})
+        forecast = simulate_forecast(days, avg_flow, temperature)
 
         return jsonify({
         "message": "Forecasted daily demand (liters)",
@@ -99,14 +183,7 @@ def schedule():
         houses = int(data.get("houses", 10))
         forecasted_demand = data.get("forecasted_demand", [])
 
-        if forecasted_demand:
-            total_demand = sum(forecasted_demand)
-            allocation = [
-            round((d / total_demand) * total_water, 2)
-            for d in forecasted_demand
-        ]
-        else:
-            allocation = [round(total_water / houses, 2) for _ in range(houses)]
+        allocation = allocate_water(total_water, houses, forecasted_demand)
 
         return jsonify({
         "total_water_available": total_water,
@@ -131,4 +208,5 @@ def simulate_data():
 # Run app
 # ------------------------
 if __name__ == '__main__':
+    load_models()
     app.run(debug=True)
@@ -0,0 +1,207 @@
+"""
+Train and compare leak-detection candidates (RF, LR, XGBoost, LightGBM).
+
+The feature matrix is built once and stored as a memory-mapped .npy file that
+every worker opens read-only, so candidates train concurrently without copying
+the data. For each candidate we record fit time, inference latency per 1k rows,
+pickled model size, accuracy and F1; selection can trade F1 against latency and
+enforce a hard latency budget.
+
+Run from the backend folder:
+    python -m scripts.compare_models --max-cores 4 --latency-budget-ms 5
+"""
+import argparse
+import os
+import pickle
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.preprocessing import LabelEncoder
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+models_dir = os.path.join(backend_dir, "models")
+DEFAULT_DATA = os.path.join(backend_dir, "notebooks", "water_leak_detection_1000_rows.csv")
+
+# Raw CSV column -> training column of the deployed leak_detector_{rf,lr}.pkl
+COLUMN_MAP = {
+    "Pressure (bar)": "pressure",
+    "Flow Rate (L/s)": "flow_rate",
+    "Temperature (°C)": "temperature",
+}
+SENSOR_COL = "Sensor_ID"
+# Same columns, order and sensor encoding as the deployed models, so candidates are
+# comparable with them and the selected pickle keeps the API's input contract
+FEATURE_COLUMNS = ["pressure", "flow_rate", "temperature", "sensor_encoded"]
+LABEL_COL = "Leak Status"
+CANDIDATES = ("rf", "lr", "xgb", "lgbm")
+
+
+def make_candidate(name, n_jobs):
+    """Return an unfitted estimator, or None if its library isn't installed."""
+    if name == "rf":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_estimators=200, max_depth=10, random_state=42, n_jobs=n_jobs)
+    if name == "lr":
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+        return make_pipeline(StandardScaler(), LogisticRegression(max_iter=500))
+    if name == "xgb":
+        try:
+            from xgboost import XGBClassifier
+        except ImportError:
+            return None
+        return XGBClassifier(n_estimators=200, max_depth=6, n_jobs=n_jobs, random_state=42)
+    if name == "lgbm":
+        try:
+            from lightgbm import LGBMClassifier
+        except ImportError:
+            return None
+        return LGBMClassifier(n_estimators=200, n_jobs=n_jobs, random_state=42, verbose=-1)
+    raise ValueError(f"Unknown candidate: {name}")
+
+
+def set_threads(model, n_jobs):
+    """Set n_jobs on the final estimator if it supports it."""
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    if "n_jobs" in est.get_params():
+        est.set_params(n_jobs=n_jobs)
+
+
+def build_feature_store(data_path, out_dir):
+    """Compute the feature matrix once and save X/y as .npy files for memory-mapping."""
+    df = pd.read_csv(data_path).rename(columns=COLUMN_MAP)
+    df["sensor_encoded"] = LabelEncoder().fit_transform(df[SENSOR_COL])
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = df[LABEL_COL].to_numpy(dtype=np.int8)
+
+    os.makedirs(out_dir, exist_ok=True)
+    x_path = os.path.join(out_dir, "features.npy")
+    y_path = os.path.join(out_dir, "labels.npy")
+    np.save(x_path, X)
+    np.save(y_path, y)
+    return x_path, y_path
+
+
+def as_frame(X):
+    """Feature rows as a DataFrame, so fitted models record feature_names_in_."""
+    return pd.DataFrame(np.asarray(X), columns=FEATURE_COLUMNS)
+
+
+def measure_latency_per_1k(model, X, repeats=5):
+    """Median single-threaded predict_proba time for 1000 rows, in milliseconds."""
+    batch = as_frame(np.resize(X, (1000, X.shape[1])))
+    set_threads(model, 1)
+    model.predict_proba(batch)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def evaluate_candidate(name, x_path, y_path, train_idx, test_idx, n_jobs):
+    """Fit and score one candidate; runs in a worker process (latency is measured later)."""
+    X = np.load(x_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    model = make_candidate(name, n_jobs)
+    if model is None:
+        return None
+
+    X_train, y_train = as_frame(X[train_idx]), y[train_idx]
+    X_test, y_test = as_frame(X[test_idx]), y[test_idx]
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    y_pred = model.predict(X_test)
+    metrics = {
+        "model": name,
+        "accuracy": accuracy_score(y_test, y_pred),
+        "f1": f1_score(y_test, y_pred, zero_division=0),
+        "fit_s": fit_s,
+        "size_kb": len(pickle.dumps(model)) / 1024,
+    }
+    return metrics, model
+
+
+def compare(x_path, y_path, candidates=CANDIDATES, max_cores=None, test_size=0.2):
+    """Train all candidates concurrently using at most `max_cores` cores in total."""
+    y = np.load(y_path, mmap_mode="r")
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=test_size,
+                                           stratify=y, random_state=42)
+
+    max_cores = max_cores or os.cpu_count() or 1
+    n_parallel = max(1, min(len(candidates), max_cores))
+    n_jobs = max(1, max_cores // n_parallel)
+
+    outputs = joblib.Parallel(n_jobs=n_parallel)(
+        joblib.delayed(evaluate_candidate)(name, x_path, y_path, train_idx, test_idx, n_jobs)
+        for name in candidates
+    )
+    outputs = [o for o in outputs if o is not None]
+
+    # time inference one model at a time, after all fitting is done, so the
+    # latency budget isn't judged under whatever else was still training
+    X = np.load(x_path, mmap_mode="r")
+    X_test = X[test_idx]
+    for metrics, model in outputs:
+        metrics["latency_ms_per_1k"] = measure_latency_per_1k(model, X_test)
+
+    report = pd.DataFrame([m for m, _ in outputs]).set_index("model")
+    models = {m["model"]: model for m, model in outputs}
+    return report, models
+
+
+def select(report, latency_budget_ms=None, latency_weight=0.0):
+    """
+    Pick the best candidate.
+
+    Args:
+        report (pd.DataFrame): Output of compare().
+        latency_budget_ms (float): Hard limit on latency per 1k rows; slower models are dropped.
+        latency_weight (float): F1 points given up per ms of latency per 1k rows.
+
+    Returns:
+        str: Name of the selected model.
+    """
+    eligible = report
+    if latency_budget_ms is not None:
+        eligible = report[report["latency_ms_per_1k"] <= latency_budget_ms]
+        if eligible.empty:
+            raise ValueError(f"No candidate meets the {latency_budget_ms} ms/1k latency budget")
+    score = eligible["f1"] - latency_weight * eligible["latency_ms_per_1k"]
+    return score.idxmax()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare leak-detection models on accuracy and latency")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="Training CSV")
+    parser.add_argument("--cache-dir", default=os.path.join(models_dir, "feature_cache"), help="Where X/y .npy files go")
+    parser.add_argument("--candidates", nargs="*", default=list(CANDIDATES), choices=CANDIDATES)
+    parser.add_argument("--max-cores", type=int, default=None, help="Total cores shared by all candidates")
+    parser.add_argument("--latency-budget-ms", type=float, default=None, help="Max predict latency per 1k rows")
+    parser.add_argument("--latency-weight", type=float, default=0.0, help="F1 penalty per ms/1k of latency")
+    parser.add_argument("--output", default=os.path.join(models_dir, "leak_detector_selected.pkl"))
+    parser.add_argument("--report", default=None, help="Comparison CSV (default: next to --output)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    x_path, y_path = build_feature_store(args.data, args.cache_dir)
+    report, models = compare(x_path, y_path, args.candidates, args.max_cores)
+    print(report.round(4).to_string())
+
+    best = select(report, args.latency_budget_ms, args.latency_weight)
+    set_threads(models[best], 1)
+    joblib.dump(models[best], args.output)
+    report_path = args.report or os.path.splitext(args.output)[0] + "_comparison.csv"
+    report.to_csv(report_path)
+    print(f"✅ Selected {best}; saved to {args.output} (report: {report_path})")
@@ -0,0 +1,100 @@
+"""
+Small closed-loop HTTP load test for the leak-prediction endpoints.
+
+Each of --concurrency threads keeps one keep-alive connection open and sends
+requests back-to-back until --requests have been sent in total. Reports
+throughput and latency percentiles so the Flask and FastAPI services can be
+compared on the same machine.
+
+Requests that don't return 200 are counted as errors and the first error body
+is shown; numbers from a run with errors don't measure scoring.
+
+Examples (start the services first):
+    python app.py                                   # Flask on :5000
+    uvicorn server:app --port 8000                  # FastAPI on :8000
+    python -m scripts.load_test --url http://127.0.0.1:5000/predict
+    python -m scripts.load_test --url http://127.0.0.1:8000/api/predict
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Fields of the shipped models (GET /model/features); override with --payload
+DEFAULT_PAYLOAD = {"pressure": 3.2, "flow": 80.0, "temperature": 22.0, "sensor_encoded": 3}
+
+
+def worker(url, payload, n, latencies, errors, error_bodies, lock):
+    target = urlparse(url)
+    conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    body = json.dumps(payload)
+    headers = {"Content-Type": "application/json"}
+    local, failed, first_error = [], 0, None
+    for _ in range(n):
+        start = time.perf_counter()
+        try:
+            conn.request("POST", target.path, body, headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            if resp.status != 200:
+                failed += 1
+                first_error = first_error or f"{resp.status} {data[:200].decode(errors='replace')}"
+        except (OSError, http.client.HTTPException) as e:
+            failed += 1
+            first_error = first_error or repr(e)
+            conn.close()
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        local.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(local)
+        errors.append(failed)
+        if first_error:
+            error_bodies.append(first_error)
+
+
+def run(url, concurrency, requests, payload=DEFAULT_PAYLOAD):
+    latencies, errors, error_bodies, lock = [], [], [], threading.Lock()
+    per_thread = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for n in per_thread:
+            pool.submit(worker, url, payload, n, latencies, errors, error_bodies, lock)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "first_error": error_bodies[0] if error_bodies else None,
+        "req_per_s": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test for /predict")
+    parser.add_argument("--url", action="append", required=True, help="Endpoint URL (repeat to compare several)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests sent first (model loading etc.)")
+    parser.add_argument("--payload", type=json.loads, default=DEFAULT_PAYLOAD, help="JSON reading to send")
+    args = parser.parse_args()
+
+    for url in args.url:
+        run(url, min(args.concurrency, args.warmup), args.warmup, args.payload)
+        r = run(url, args.concurrency, args.requests, args.payload)
+        print(f"{r['url']}: {r['req_per_s']:.0f} req/s, p50 {r['p50_ms']:.1f} ms, "
+              f"p95 {r['p95_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms, errors {r['errors']}/{r['requests']}")
+        if r["errors"]:
+            print(f"  ⚠️ {r['errors']} requests failed, e.g. {r['first_error']}; these numbers don't measure scoring")
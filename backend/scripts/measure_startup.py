@@ -0,0 +1,57 @@
+"""
+Measure cold import time of the backend and simulation modules.
+
+Each module is imported in a fresh interpreter (so nothing is cached in
+sys.modules) and the median wall time over several runs is reported.
+
+Run from the repo root:
+    python backend/scripts/measure_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (working directory, module) pairs, matching how each module is normally run
+MODULES = [
+    ("backend", "app"),
+    ("backend", "server"),
+    ("simulation", "village_model"),
+    ("simulation", "plot_scenarios"),
+]
+
+
+def import_time(workdir, module, runs):
+    """Median seconds to start Python and import `module` from `workdir`."""
+    env = dict(os.environ, MONGO_URL=os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+               DB_NAME=os.environ.get("DB_NAME", "startup_probe"), MPLBACKEND="Agg")
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=workdir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        timings.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+    return statistics.median(timings), None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold import timings")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = import_time(repo_dir, "sys", args.runs)
+    print(f"{'module':<30}{'import (ms)':>12}")
+    print(f"{'python startup':<30}{baseline * 1000:>12.0f}")
+    for sub, module in MODULES:
+        seconds, error = import_time(os.path.join(repo_dir, sub), module, args.runs)
+        name = f"{sub}/{module}.py"
+        if error:
+            print(f"{name:<30}{'failed':>12}  ({error})")
+        else:
+            print(f"{name:<30}{seconds * 1000:>12.0f}")
@@ -1,23 +1,109 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, model_validator
+from typing import List, Optional
 import uuid
+import numpy as np
 from datetime import datetime, timezone
+from utils import wire, scoring
+from utils.planning import forecast_demand, allocate_water
+from utils.batching import AsyncMicroBatcher
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection (created on first use)
+client = None
+_db = None
+
+
+def get_db():
+    global client, _db
+    if _db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        _db = client[os.environ['DB_NAME']]
+    return _db
+
+# Inference process pool (created on first use). Model scoring is CPU-bound, so it
+# runs in worker processes that each load the models once; the event loop only awaits.
+_pool = None
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 1))
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=INFERENCE_WORKERS,
+                                    mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=scoring.init_worker)
+    return _pool
+
+
+def discard_pool(pool=None):
+    """Shut down the inference pool so the next call starts a fresh one (only `pool`, if given)."""
+    global _pool, _feature_names
+    if _pool is None or (pool is not None and pool is not _pool):
+        return  # already replaced by a concurrent call
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool, _feature_names = None, None
+
+
+async def run_in_pool(fn, *args):
+    pool = get_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # a worker died; every later submit to this pool would fail too
+        discard_pool(pool)
+        raise
+
+
+async def score_features(features):
+    return await run_in_pool(scoring.score_in_worker, features)
+
+
+# Request fields the deployed models expect, in column order (asked from a worker once)
+_feature_names = None
+
+
+async def get_feature_names():
+    global _feature_names
+    if _feature_names is None:
+        _feature_names = await run_in_pool(scoring.worker_features)
+    return _feature_names
+
+
+async def run_scoring(call):
+    """Await a scoring call, turning failures into JSON HTTP errors instead of bare 500s."""
+    try:
+        return await call
+    except BrokenProcessPool as e:
+        raise HTTPException(status_code=503, detail=f"Inference workers unavailable: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Readings could not be scored: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scoring failed: {e}")
+
+
+# Concurrent single-reading /predict calls share one pool round-trip
+batcher = AsyncMicroBatcher(
+    score_features,
+    window_ms=float(os.environ.get('BATCH_WINDOW_MS', 2)),
+    max_batch_size=int(os.environ.get('BATCH_MAX_SIZE', 64)),
+    max_in_flight=INFERENCE_WORKERS,
+)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -37,6 +123,78 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+# Readings: which fields are required depends on the deployed models (GET /api/model/features)
+class SensorReading(BaseModel):
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    pressure: float
+    flow: float
+    temperature: float
+    sensor_encoded: Optional[float] = None
+
+    def row(self, features):
+        return [_required(self, f) for f in features]
+
+class SensorBatch(BaseModel):
+    """Column lists ({"pressure": [...], ...}) or row objects ({"readings": [{...}, ...]})."""
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    pressure: Optional[List[float]] = None
+    flow: Optional[List[float]] = None
+    temperature: Optional[List[float]] = None
+    sensor_encoded: Optional[List[float]] = None
+    readings: Optional[List[SensorReading]] = None
+
+    @model_validator(mode="after")
+    def one_shape(self):
+        columns = [c for c in (self.pressure, self.flow, self.temperature, self.sensor_encoded) if c is not None]
+        if self.readings is not None and columns:
+            raise ValueError("send either reading columns or readings, not both")
+        if len({len(c) for c in columns}) > 1:
+            raise ValueError("all reading columns must have the same length")
+        return self
+
+    def matrix(self, features):
+        if self.readings is not None:
+            rows = [r.row(features) for r in self.readings]
+            return np.asarray(rows, dtype=np.float64).reshape(len(rows), len(features))
+        return np.column_stack([np.asarray(_required(self, f), dtype=np.float64) for f in features])
+
+def _required(reading, field):
+    value = getattr(reading, field, None)
+    if value is None:
+        raise HTTPException(status_code=422, detail=f"Missing field: {field}")
+    return value
+
+class LeakPrediction(BaseModel):
+    RandomForest_Prediction: int
+    RandomForest_Leak_Probability: float
+    LogisticRegression_Prediction: int
+    LogisticRegression_Leak_Probability: float
+
+class ForecastRequest(BaseModel):
+    days: int = Field(7, ge=1, le=365)
+    avg_flow: float = 100
+    temperature: float = 25
+
+class DailyDemand(BaseModel):
+    day: int
+    predicted_demand_L: float
+
+class ForecastResponse(BaseModel):
+    message: str
+    forecast: List[DailyDemand]
+
+class ScheduleRequest(BaseModel):
+    total_water: float = Field(10000, gt=0)     # total liters available
+    houses: int = Field(10, ge=1)
+    forecasted_demand: List[float] = []
+
+class ScheduleResponse(BaseModel):
+    total_water_available: float
+    houses: int
+    allocation_L_per_house: List[float]
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -51,13 +209,13 @@ async def create_status_check(input: StatusCheckCreate):
     doc = status_obj.model_dump()
     doc['timestamp'] = doc['timestamp'].isoformat()
     
-    _ = await db.status_checks.insert_one(doc)
+    _ = await get_db().status_checks.insert_one(doc)
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+    status_checks = await get_db().status_checks.find({}, {"_id": 0}).to_list(1000)
     
     # Convert ISO string timestamps back to datetime objects
     for check in status_checks:
@@ -66,9 +224,66 @@ async def get_status_checks():
     
     return status_checks
 
+@api_router.get("/model/features")
+async def model_features():
+    return {"features": list(await run_scoring(get_feature_names()))}
+
+@api_router.post("/predict", response_model=LeakPrediction)
+async def predict(reading: SensorReading):
+    row = reading.row(await run_scoring(get_feature_names()))
+    result = await run_scoring(batcher.submit(row))
+    return {name: result[name].item() for name in wire.SCORE_DTYPE.names}
+
+@api_router.post("/predict/batch")
+async def predict_batch(request: Request):
+    # JSON columns or a binary .npy matrix (see utils/wire.py); validated once per batch
+    body = await request.body()
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    feature_names = await run_scoring(get_feature_names())
+    try:
+        if content_type == wire.NPY_CONTENT_TYPE:
+            features = wire.decode_npy(body, feature_names)
+        else:
+            features = SensorBatch.model_validate_json(body).matrix(feature_names)
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    results = await run_scoring(score_features(features))
+    if wire.wants_npy(content_type, request.headers.get('accept')):
+        return Response(wire.encode_results(results), media_type=wire.NPY_CONTENT_TYPE)
+    return wire.results_to_json(results)
+
+@api_router.get("/metrics/batching")
+async def batching_metrics():
+    return batcher.metrics()
+
+@api_router.post("/forecast", response_model=ForecastResponse)
+async def forecast(input: ForecastRequest):
+    return {
+        "message": "Forecasted daily demand (liters)",
+        "forecast": forecast_demand(input.days, input.avg_flow, input.temperature),
+    }
+
+@api_router.post("/schedule", response_model=ScheduleResponse)
+async def schedule(input: ScheduleRequest):
+    if input.forecasted_demand and sum(input.forecasted_demand) <= 0:
+        raise HTTPException(status_code=422, detail="forecasted_demand must sum to a positive value")
+    return {
+        "total_water_available": input.total_water,
+        "houses": input.houses,
+        "allocation_L_per_house": allocate_water(input.total_water, input.houses, input.forecasted_demand),
+    }
+
 # Include the router in the main app
 app.include_router(api_router)
 
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # drop the offending input: NaN/Infinity can't be echoed back as JSON
+    errors = [{k: v for k, v in e.items() if k not in ("input", "ctx")} for e in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": errors})
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -84,6 +299,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_batcher():
+    batcher.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await batcher.stop()
+    if client is not None:
+        client.close()
+    discard_pool()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the backend imports its helpers as the top-level `utils` package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.batching import AsyncMicroBatcher, MicroBatcher
+
+
+def row_sums(matrix):
+    if np.isnan(matrix).any():
+        raise ValueError("NaN in batch")
+    return matrix.sum(axis=1)
+
+
+ROWS = [np.array([1.0, 2.0]), np.array([np.nan, 1.0]), np.array([3.0, 4.0])]
+
+
+def test_micro_batcher_isolates_bad_rows():
+    batcher = MicroBatcher(row_sums, window_ms=200.0)
+    futures = [batcher.submit(row) for row in ROWS]
+
+    assert futures[0].result(timeout=5) == 3.0
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 7.0
+    assert batcher.metrics()["largest_batch"] == 3
+
+
+def test_async_micro_batcher_isolates_bad_rows():
+    async def score(matrix):
+        return row_sums(matrix)
+
+    async def run():
+        batcher = AsyncMicroBatcher(score, window_ms=50.0)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(r) for r in ROWS), return_exceptions=True), batcher
+        finally:
+            await batcher.stop()
+
+    (good, bad, other), batcher = asyncio.run(run())
+    assert (good, other) == (3.0, 7.0)
+    assert isinstance(bad, ValueError)
+    assert batcher.largest_batch == 3
+
+
+def test_async_micro_batcher_rebinds_to_a_new_loop():
+    async def score(matrix):
+        return matrix.sum(axis=1)
+
+    batcher = AsyncMicroBatcher(score, window_ms=1.0)
+    assert asyncio.run(batcher.submit(np.array([1.0, 1.0]))) == 2.0
+    assert asyncio.run(batcher.submit(np.array([2.0, 2.0]))) == 4.0
@@ -0,0 +1,45 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+server = pytest.importorskip("server")
+
+FEATURES = ["pressure", "flow", "temperature", "sensor_encoded"]
+
+
+def test_sensor_batch_accepts_columns_or_readings():
+    columns = server.SensorBatch.model_validate_json(
+        '{"pressure": [30, 31], "flow": [5, 6], "temperature": [20, 21], "sensor_encoded": [1, 2]}')
+    readings = server.SensorBatch.model_validate_json(
+        '{"readings": [{"pressure": 30, "flow": 5, "temperature": 20, "sensor_encoded": 1},'
+        ' {"pressure": 31, "flow": 6, "temperature": 21, "sensor_encoded": 2}]}')
+    np.testing.assert_array_equal(columns.matrix(FEATURES), readings.matrix(FEATURES))
+    assert readings.matrix(FEATURES).shape == (2, 4)
+
+
+@pytest.mark.parametrize("body", [
+    '{"pressure": [30], "flow": [5], "temperature": [20], "readings": []}',
+    '{"pressure": [30, 31], "flow": [5], "temperature": [20]}',
+    '{"readings": [{"pressure": NaN, "flow": 5, "temperature": 20}]}',
+])
+def test_sensor_batch_rejects_bad_bodies(body):
+    with pytest.raises(ValidationError):
+        server.SensorBatch.model_validate_json(body)
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    monkeypatch.setattr(server, "INFERENCE_WORKERS", 1)
+    server.discard_pool()
+    broken = server.get_pool()
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(server.run_in_pool(os._exit, 1))
+    assert server._pool is None
+    try:
+        assert asyncio.run(server.run_in_pool(abs, -3)) == 3
+        assert server._pool is not broken
+    finally:
+        server.discard_pool()
@@ -0,0 +1,229 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, score_fn, window_ms=2.0, max_batch_size=64):
+        """
+        Collect concurrent single-row requests into one vectorized model call.
+
+        Callers submit one feature row and block on the returned Future. A
+        worker thread waits for the first row, keeps collecting for up to
+        `window_ms` or until `max_batch_size` rows are queued, then calls
+        `score_fn` once on the stacked matrix and hands each caller its row.
+
+        Args:
+            score_fn (callable): Maps an (n, n_features) matrix to n results (array indexable by row).
+            window_ms (float): Longest time the first row in a batch waits for company.
+            max_batch_size (int): Batch is flushed as soon as it reaches this size.
+        """
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._worker.start()
+
+    def submit(self, row):
+        """Queue one feature row; returns a Future resolving to that row's result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(row), future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score_each(self, batch):
+        """Fallback after a failed batch call: score rows one by one so only bad rows fail."""
+        for row, future in batch:
+            try:
+                future.set_result(self.score_fn(row.reshape(1, -1))[0])
+            except Exception as e:
+                future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            rows, futures = zip(*batch)
+            try:
+                results = self.score_fn(np.vstack(rows))
+                for i, future in enumerate(futures):
+                    future.set_result(results[i])
+            except Exception as e:
+                if len(batch) == 1:
+                    futures[0].set_exception(e)
+                else:
+                    self._score_each(batch)
+            with self._stats_lock:
+                self.batches += 1
+                self.rows += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def metrics(self):
+        """Queue depth and achieved batch sizes so far."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "rows": self.rows,
+                "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "window_ms": self.window * 1000.0,
+                "max_batch_size": self.max_batch_size,
+            }
+
+
+class AsyncMicroBatcher:
+    def __init__(self, score_fn, window_ms=2.0, max_batch_size=64, max_in_flight=1):
+        """
+        asyncio counterpart of MicroBatcher for async servers.
+
+        `score_fn` is a coroutine function taking an (n, n_features) matrix
+        (e.g. one that awaits a process pool). Up to `max_in_flight` batches
+        run at once (one per pool worker); while all are busy, new readings
+        keep queueing and go out together in the next batch.
+
+        The queue and collector task belong to one event loop: call start()
+        and stop() from the server's startup/shutdown hooks. submit() also
+        (re)starts the batcher if it is used from a different loop.
+        """
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._collector = None
+        self._tasks = set()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.in_flight = 0
+
+    def start(self):
+        """Bind the queue and collector task to the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._collector = self._spawn(self._run())
+
+    async def stop(self):
+        """Cancel the collector and in-flight batches; queued callers get CancelledError."""
+        tasks = [t for t in [self._collector, *self._tasks] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._loop = self._queue = self._slots = self._collector = None
+        self.in_flight = 0
+
+    def _spawn(self, coro):
+        # keep a reference so the task isn't garbage-collected mid-flight
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def submit(self, row):
+        """Queue one feature row and wait for its result."""
+        if self._loop is not asyncio.get_running_loop():
+            self.start()
+        future = self._loop.create_future()
+        self._queue.put_nowait((np.asarray(row), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._spawn(self._dispatch(batch))
+
+    async def _score_each(self, batch):
+        """Fallback after a failed batch call: score rows one by one so only bad rows fail."""
+        for row, future in batch:
+            try:
+                result = (await self.score_fn(row.reshape(1, -1)))[0]
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _dispatch(self, batch):
+        rows, futures = zip(*batch)
+        self.in_flight += 1
+        try:
+            results = await self.score_fn(np.vstack(rows))
+            for i, future in enumerate(futures):
+                if not future.done():
+                    future.set_result(results[i])
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            if len(batch) > 1:
+                await self._score_each(batch)
+            elif not futures[0].done():
+                futures[0].set_exception(e)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def metrics(self):
+        """Queue depth, batches in flight and achieved batch sizes so far."""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+        }
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+def model_version(path):
+    """Short content hash of a model file, used to key cached explanations."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+class LeakExplainer:
+    def __init__(self, model, version, feature_names, quantum=0.01, cache_size=10000):
+        """
+        Batched, cached TreeSHAP attributions for the leak class of a tree model.
+
+        Args:
+            model: Fitted tree ensemble (e.g. the RandomForest leak detector).
+            version (str): Model version; part of every cache key.
+            feature_names (list): Names of the model's input columns.
+            quantum (float): Feature values are rounded to multiples of this for cache keys.
+            cache_size (int): Maximum number of cached explanations (LRU).
+        """
+        self.model = model
+        self.version = version
+        self.feature_names = list(feature_names)
+        self.quantum = quantum
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.seconds_per_row = None
+        self._explainer = None
+        self._expected_value = None
+        self._warm_up_thread = None
+        self._base_rate = self._root_leak_fraction()
+
+    def _root_leak_fraction(self):
+        """Training-set leak fraction from the trees' root nodes (None if the model has no trees)."""
+        trees = [getattr(est, "tree_", None) for est in getattr(self.model, "estimators_", [self.model])]
+        if not trees or any(t is None for t in trees):
+            return None
+        roots = np.array([t.value[0, 0] for t in trees], dtype=float)
+        return float(np.mean(roots[:, -1] / roots.sum(axis=1)))
+
+    def warm_up(self):
+        """Import shap and build the TreeExplainer (slow; kept off the request path)."""
+        try:
+            import shap
+        except ImportError:
+            return
+        explainer = shap.TreeExplainer(self.model)
+        self._expected_value = float(np.atleast_1d(explainer.expected_value)[-1])
+        self._explainer = explainer
+
+    def start_warm_up(self):
+        """Build the TreeExplainer on a background thread, once."""
+        if self._explainer is None and self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.warm_up, daemon=True)
+            self._warm_up_thread.start()
+
+    def _tree_explainer(self):
+        """The TreeExplainer if ready; otherwise start building it in the background and return None."""
+        self.start_warm_up()
+        return self._explainer
+
+    def _key(self, row):
+        return (self.version,) + tuple(np.round(row / self.quantum).astype(np.int64).tolist())
+
+    def _lookup(self, key):
+        with self._cache_lock:
+            if key not in self.cache:
+                return None
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+    def _remember(self, key, attributions):
+        with self._cache_lock:
+            self.cache[key] = attributions
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _treeshap(self, rows):
+        values = self._explainer.shap_values(rows, check_additivity=False)
+        if isinstance(values, list):
+            values = values[-1]
+        elif values.ndim == 3:
+            values = values[:, :, -1]
+        return values
+
+    def _approximate(self, rows, probs):
+        """Cheap stand-in: global importances scaled to each row's (probability - base rate)."""
+        weights = getattr(self.model, "feature_importances_", np.ones(len(self.feature_names)))
+        weights = weights / weights.sum()
+        base = self._expected_value if self._expected_value is not None else self._base_rate
+        if base is None:
+            base = float(np.mean(probs))
+        return np.outer(probs - base, weights)
+
+    def explain(self, rows, probs, budget_ms=50.0):
+        """
+        Attribute each row's leak probability to its features within a latency budget.
+
+        Rows are served from the cache first; the rest go through TreeSHAP in
+        batches sized to the remaining budget. Anything still left when the
+        budget runs out gets approximate attributions.
+
+        Args:
+            rows (np.ndarray): (n, n_features) feature matrix.
+            probs (np.ndarray): Leak probabilities for rows (used by the fallback).
+            budget_ms (float): Time budget for the whole call.
+
+        Returns:
+            list: One dict per row with "attributions" (feature -> value) and "source".
+        """
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        keys = [self._key(r) for r in rows]
+        values = [None] * len(rows)
+        sources = [None] * len(rows)
+
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self._lookup(key)
+            if cached is not None:
+                values[i], sources[i] = cached, "cached"
+            else:
+                pending.append(i)
+
+        if pending and self._tree_explainer() is not None:
+            while pending:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                if self.seconds_per_row is None:
+                    batch = pending[:1]
+                else:
+                    batch = pending[:max(1, int(remaining / self.seconds_per_row))]
+                start = time.perf_counter()
+                shap_values = self._treeshap(rows[batch])
+                per_row = (time.perf_counter() - start) / len(batch)
+                self.seconds_per_row = per_row if self.seconds_per_row is None else 0.8 * self.seconds_per_row + 0.2 * per_row
+                for i, v in zip(batch, shap_values):
+                    values[i], sources[i] = v, "treeshap"
+                    self._remember(keys[i], v)
+                pending = pending[len(batch):]
+
+        if pending:
+            approx = self._approximate(rows[pending], np.asarray(probs)[pending])
+            for i, v in zip(pending, approx):
+                values[i], sources[i] = v, "approximate"
+
+        return [
+            {"attributions": dict(zip(self.feature_names, np.asarray(v, dtype=float).tolist())), "source": s}
+            for v, s in zip(values, sources)
+        ]
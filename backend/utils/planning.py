@@ -0,0 +1,19 @@
+import random
+
+
+def forecast_demand(days=7, avg_flow=100.0, temperature=25.0):
+    """Daily demand forecast in liters (simple simulated model — could later be replaced with ARIMA/LSTM)."""
+    forecast = []
+    for d in range(1, days + 1):
+        fluctuation = random.uniform(-5, 5)
+        demand = round(avg_flow + (temperature * 0.2) + fluctuation, 2)
+        forecast.append({"day": d, "predicted_demand_L": demand})
+    return forecast
+
+
+def allocate_water(total_water=10000.0, houses=10, forecasted_demand=None):
+    """Split total_water across houses, proportional to forecasted demand if given, else evenly."""
+    if forecasted_demand:
+        total_demand = sum(forecasted_demand)
+        return [round((d / total_demand) * total_water, 2) for d in forecasted_demand]
+    return [round(total_water / houses, 2) for _ in range(houses)]
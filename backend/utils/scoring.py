@@ -0,0 +1,80 @@
+import os
+import numpy as np
+from utils import wire
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.environ.get("MODELS_DIR", os.path.join(backend_dir, "models"))
+RF_FILE = "leak_detector_rf.pkl"
+LR_FILE = "leak_detector_lr.pkl"
+
+
+def load_models(models_dir=MODELS_DIR):
+    """Load the RandomForest and LogisticRegression leak models (raises on failure)."""
+    import joblib  # unpickling pulls in scikit-learn
+    rf_model = joblib.load(os.path.join(models_dir, RF_FILE))
+    lr_model = joblib.load(os.path.join(models_dir, LR_FILE))
+    return rf_model, lr_model
+
+
+def model_features(rf_model, lr_model):
+    """Request fields both models expect, in column order (wire.FEATURES when they aren't loaded)."""
+    if not (rf_model and lr_model):
+        return wire.FEATURES
+    rf_features, lr_features = wire.feature_names(rf_model), wire.feature_names(lr_model)
+    if rf_features != lr_features:
+        raise ValueError(f"RandomForest expects {rf_features} but LogisticRegression expects {lr_features}")
+    return rf_features
+
+
+def score(rf_model, lr_model, features):
+    """
+    Run both models over an (n, n_features) matrix in model_features() order.
+
+    Falls back to random probabilities (and no-leak predictions) when the
+    models are unavailable, matching the single-reading /predict behaviour.
+
+    Returns:
+        np.ndarray: wire.SCORE_DTYPE record array, one record per row.
+    """
+    results = np.empty(len(features), dtype=wire.SCORE_DTYPE)
+    if len(features) == 0:
+        return results
+    if rf_model and lr_model:
+        rf_prob = rf_model.predict_proba(features)[:, 1]
+        lr_prob = lr_model.predict_proba(features)[:, 1]
+        results["RandomForest_Prediction"] = rf_model.classes_[(rf_prob > 0.5).astype(int)]
+        results["LogisticRegression_Prediction"] = lr_model.classes_[(lr_prob > 0.5).astype(int)]
+    else:
+        rf_prob = np.random.uniform(0, 1, len(features))
+        lr_prob = np.random.uniform(0, 1, len(features))
+        results["RandomForest_Prediction"] = 0
+        results["LogisticRegression_Prediction"] = 0
+    results["RandomForest_Leak_Probability"] = rf_prob
+    results["LogisticRegression_Leak_Probability"] = lr_prob
+    return results
+
+
+# ------------------------
+# Process-pool workers
+# ------------------------
+_worker_models = (None, None)
+
+
+def init_worker(models_dir=MODELS_DIR):
+    """ProcessPoolExecutor initializer: load the models once per worker process."""
+    global _worker_models
+    try:
+        _worker_models = load_models(models_dir)
+    except Exception as e:
+        print(f"⚠️ Model loading failed in worker {os.getpid()}: {e}")
+        _worker_models = (None, None)
+
+
+def worker_features():
+    """Request fields expected by the models loaded by init_worker."""
+    return model_features(*_worker_models)
+
+
+def score_in_worker(features):
+    """Score a feature matrix with the models loaded by init_worker."""
+    return score(_worker_models[0], _worker_models[1], features)
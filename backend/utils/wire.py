@@ -0,0 +1,129 @@
+import io
+import numpy as np
+
+# Binary batch format: a single NumPy .npy payload (np.save / np.load, no pickle).
+NPY_CONTENT_TYPE = "application/x-npy"
+
+# Default column order of the feature matrix fed to the leak models. The deployed
+# models define the real contract: see feature_names().
+FEATURES = ("pressure", "flow", "temperature")
+
+# Training column name -> request field name, where the two differ.
+FIELD_ALIASES = {"flow_rate": "flow"}
+
+# One record per reading as scored (full precision; what the JSON responses carry).
+SCORE_DTYPE = np.dtype([
+    ("RandomForest_Prediction", np.int64),
+    ("RandomForest_Leak_Probability", np.float64),
+    ("LogisticRegression_Prediction", np.int64),
+    ("LogisticRegression_Leak_Probability", np.float64),
+])
+
+# Compact record layout of .npy batch responses.
+RESULT_DTYPE = np.dtype([
+    ("RandomForest_Prediction", np.int8),
+    ("RandomForest_Leak_Probability", np.float32),
+    ("LogisticRegression_Prediction", np.int8),
+    ("LogisticRegression_Leak_Probability", np.float32),
+])
+
+
+def feature_names(model):
+    """
+    Request field names, in column order, of the features `model` was fitted on.
+
+    Uses the model's feature_names_in_ (mapped through FIELD_ALIASES); models
+    fitted on plain arrays must have len(FEATURES) columns.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return tuple(FIELD_ALIASES.get(str(n), str(n)) for n in names)
+    n_features = getattr(model, "n_features_in_", len(FEATURES))
+    if n_features != len(FEATURES):
+        raise ValueError(f"Model expects {n_features} unnamed features; cannot map them to {', '.join(FEATURES)}")
+    return FEATURES
+
+
+def decode_npy(body, features=FEATURES):
+    """
+    Decode an .npy payload straight into a feature matrix.
+
+    Args:
+        body (bytes): Request body written with np.save, shape (n, len(features)).
+        features (tuple): Expected columns, in order.
+
+    Returns:
+        np.ndarray: Float feature matrix; no per-value Python objects are created.
+    """
+    names = features
+    features = np.load(io.BytesIO(body), allow_pickle=False)
+    if features.ndim == 1 and features.size == len(names):
+        features = features.reshape(1, -1)
+    if features.ndim != 2 or features.shape[1] != len(names):
+        raise ValueError(f"Expected an (n, {len(names)}) array of {', '.join(names)}, got shape {features.shape}")
+    if features.dtype.kind != "f":
+        features = features.astype(np.float64)
+    return check_finite(features)
+
+
+def check_finite(features):
+    """Reject NaN/inf readings before they reach the models."""
+    if not np.isfinite(features).all():
+        raise ValueError("Readings must be finite numbers (no NaN or Infinity)")
+    return features
+
+
+def encode_results(results):
+    """.npy bytes of scored records in the compact RESULT_DTYPE layout."""
+    return encode_npy(results.astype(RESULT_DTYPE))
+
+
+def encode_npy(array):
+    """Serialise an array (plain or structured) as .npy bytes."""
+    buf = io.BytesIO()
+    np.save(buf, np.ascontiguousarray(array), allow_pickle=False)
+    return buf.getvalue()
+
+
+def _field(data, name):
+    if data.get(name) is None:
+        raise ValueError(f"Missing field: {name}")
+    return data[name]
+
+
+def row_from_json(data, features=FEATURES):
+    """Feature vector for one JSON reading ({"pressure": ..., "flow": ..., ...})."""
+    if data is None:
+        raise ValueError("Missing JSON body")
+    return check_finite(np.array([float(_field(data, f)) for f in features], dtype=np.float64))
+
+
+def features_from_json(data, features=FEATURES):
+    """
+    Build a feature matrix from a JSON batch.
+
+    Accepts either column lists ({"pressure": [...], "flow": [...], ...})
+    or row objects ({"readings": [{"pressure": ..., ...}, ...]}).
+    """
+    if data is None:
+        raise ValueError("Missing JSON body")
+    if "readings" in data:
+        rows = [row_from_json(r, features) for r in data["readings"]]
+        return np.array(rows, dtype=np.float64).reshape(-1, len(features))
+    columns = [np.asarray(_field(data, f), dtype=np.float64) for f in features]
+    if len({len(c) for c in columns}) > 1:
+        raise ValueError(f"{', '.join(features)} must have the same length")
+    return check_finite(np.column_stack(columns))
+
+
+def results_to_json(results):
+    """Column-wise JSON view of a SCORE_DTYPE record array."""
+    return {name: results[name].tolist() for name in results.dtype.names}
+
+
+def wants_npy(content_type, accept):
+    """Reply in .npy if the Accept header asks for it, or the request was .npy and JSON wasn't requested."""
+    accept = accept or ""
+    if NPY_CONTENT_TYPE in accept:
+        return True
+    return content_type == NPY_CONTENT_TYPE and "application/json" not in accept
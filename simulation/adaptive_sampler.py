@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+adaptive_sampler.py
+
+Active-learning alternative to the fixed scenario grid in generate_leaks.py.
+Leak scenarios (location, area, discharge coefficient, start/end time) are
+drawn by Latin-hypercube sampling; between rounds a cheap leak classifier is
+retrained and the next simulations are chosen where it is most uncertain.
+Sampling stops once validation accuracy plateaus.
+
+Usage examples:
+    python adaptive_sampler.py --inp simulation/village_model.inp --out simulation/data/adaptive
+    python adaptive_sampler.py --inp simulation/village_model.inp --out simulation/data/adaptive --batch 4 --max-sims 60
+
+How the next scenarios are picked:
+  - the classifier's out-of-bag error on every simulated scenario tells us
+    which scenarios it still gets wrong
+  - a random-forest surrogate maps scenario parameters -> that error, and the
+    candidates with the highest predicted error (mean + spread across trees)
+    are simulated next
+
+Requirements:
+  pip install wntr pandas numpy scipy scikit-learn
+
+"""
+
+from pathlib import Path
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from generate_leaks import (SMALL_LEAK_AREA, BIG_LEAK_AREA, ensure_dir, load_model,
+                            add_leaks_to_wn, run_sim_and_save)
+
+
+# --- configuration ---
+DEFAULT_DURATION = 24 * 3600
+DISCHARGE_COEFF_RANGE = (0.6, 0.9)
+LEAK_HOURS_RANGE = (1, 6)
+CANDIDATE_POOL = 500
+
+
+# --- sampling ---
+
+def latin_hypercube_leaks(n: int, nodes: list, duration: int, timestep: int, seed: int = None) -> list:
+    """Draw `n` single-leak parameter sets by Latin-hypercube sampling."""
+    u = qmc.LatinHypercube(d=5, seed=seed).random(n)
+    log_lo, log_hi = np.log(SMALL_LEAK_AREA), np.log(BIG_LEAK_AREA)
+    cd_lo, cd_hi = DISCHARGE_COEFF_RANGE
+    len_lo, len_hi = (h * 3600 for h in LEAK_HOURS_RANGE)
+
+    leaks = []
+    for row in u:
+        length = len_lo + row[4] * (len_hi - len_lo)
+        start = row[3] * max(duration - length, 0)
+        start = int(start // timestep * timestep)
+        end = int(min(start + max(timestep, length // timestep * timestep), duration))
+        leaks.append({
+            "junction": nodes[min(int(row[0] * len(nodes)), len(nodes) - 1)],
+            "area": float(np.exp(log_lo + row[1] * (log_hi - log_lo))),
+            "discharge_coeff": float(cd_lo + row[2] * (cd_hi - cd_lo)),
+            "start_time": start,
+            "end_time": end,
+        })
+    return leaks
+
+
+def leak_vector(leak: dict, coords: dict) -> list:
+    """Numeric encoding of a leak for the surrogate (location as coordinates)."""
+    x, y = coords[leak["junction"]]
+    return [x, y, np.log(leak["area"]), leak["discharge_coeff"], leak["start_time"], leak["end_time"]]
+
+
+# --- simulation + features ---
+
+class ScenarioRunner:
+    """Runs leak scenarios and turns them into (features, labels) rows."""
+
+    def __init__(self, inp_path: Path, out_dir: Path, simulator: str, duration: int, sensors: list = None):
+        self.inp_path = inp_path
+        self.out_dir = out_dir
+        self.simulator = simulator
+        self.duration = duration
+        self.num_sims = 0
+
+        wn = self._load()
+        self.timestep = wn.options.time.hydraulic_timestep
+        self.junctions = list(wn.junction_name_list)
+        self.sensors = sensors or self.junctions
+        self.coords = {name: wn.get_node(name).coordinates for name in self.junctions}
+        self.baseline = self._simulate("normal", [])
+
+    def _load(self):
+        wn = load_model(self.inp_path)
+        wn.options.time.duration = self.duration
+        return wn
+
+    def _simulate(self, name: str, leaks: list) -> pd.DataFrame:
+        wn = self._load()
+        if leaks:
+            add_leaks_to_wn(wn, leaks)
+        results = run_sim_and_save(wn, name, self.out_dir, simulator=self.simulator)
+        self.num_sims += 1
+        return results.node["pressure"][self.sensors]
+
+    def run(self, name: str, leak: dict):
+        """Simulate one leak; return features (pressure drop vs. normal) and per-step labels."""
+        pressure = self._simulate(name, [leak])
+        X = (self.baseline.loc[pressure.index] - pressure).to_numpy()
+        t = pressure.index.to_numpy()
+        y = ((t >= leak["start_time"]) & (t < leak["end_time"])).astype(int)
+        return X, y
+
+
+# --- active learning loop ---
+
+def _stack(runs: list):
+    return np.vstack([r[0] for r in runs]), np.concatenate([r[1] for r in runs])
+
+
+def fit_leak_model(runs: list, seed: int):
+    X, y = _stack(runs)
+    model = RandomForestClassifier(n_estimators=100, max_depth=8, oob_score=True,
+                                   random_state=seed, n_jobs=-1)
+    model.fit(X, y)
+    return model
+
+
+def scenario_errors(model, runs: list) -> np.ndarray:
+    """Mean out-of-bag |label - P(leak)| per scenario."""
+    oob = np.nan_to_num(model.oob_decision_function_[:, -1], nan=0.5)
+    errors, offset = [], 0
+    for _, y in runs:
+        errors.append(np.abs(y - oob[offset:offset + len(y)]).mean())
+        offset += len(y)
+    return np.array(errors)
+
+
+def pick_uncertain(train_leaks: list, errors: np.ndarray, pool: list, coords: dict, k: int, seed: int) -> list:
+    """Indices of the `k` pool leaks with the highest predicted model error."""
+    surrogate = RandomForestRegressor(n_estimators=100, min_samples_leaf=2, random_state=seed, n_jobs=-1)
+    surrogate.fit([leak_vector(l, coords) for l in train_leaks], errors)
+    P = np.array([leak_vector(l, coords) for l in pool])
+    per_tree = np.stack([tree.predict(P) for tree in surrogate.estimators_])
+    score = per_tree.mean(axis=0) + per_tree.std(axis=0)
+    return list(np.argsort(score)[::-1][:k])
+
+
+def active_learning(runner: ScenarioRunner, init: int, batch: int, val: int, max_sims: int,
+                    patience: int, tol: float, seed: int):
+    if runner.num_sims + val + init > max_sims:
+        raise ValueError(f"max_sims={max_sims} leaves no room for {val} validation + {init} initial "
+                         f"scenarios after {runner.num_sims} run_sim calls already made")
+    rng = np.random.default_rng(seed)
+    nodes = runner.junctions
+    log = []
+
+    val_leaks = latin_hypercube_leaks(val, nodes, runner.duration, runner.timestep, seed=rng)
+    val_runs = [runner.run(f"val_{i}", leak) for i, leak in enumerate(val_leaks)]
+    X_val, y_val = _stack(val_runs)
+    log += [dict(leak, split="val", round=0) for leak in val_leaks]
+
+    pool = latin_hypercube_leaks(CANDIDATE_POOL, nodes, runner.duration, runner.timestep, seed=rng)
+    train_leaks = pool[:init]
+    pool = pool[init:]
+    train_runs = [runner.run(f"al_0_{i}", leak) for i, leak in enumerate(train_leaks)]
+    log += [dict(leak, split="train", round=0) for leak in train_leaks]
+
+    best_acc, best_model, best_size, stale, rnd = -1.0, None, 0, 0, 0
+    while True:
+        model = fit_leak_model(train_runs, seed)
+        acc = float((model.predict(X_val) == y_val).mean())
+        logging.info("Round %d: %d train scenarios, val accuracy %.4f, %d run_sim calls",
+                     rnd, len(train_runs), acc, runner.num_sims)
+
+        if acc > best_acc + tol:
+            best_acc, best_model, best_size, stale = acc, model, len(train_runs), 0
+        else:
+            stale += 1
+        if stale >= patience or runner.num_sims + batch > max_sims or not pool:
+            break
+
+        rnd += 1
+        chosen = pick_uncertain(train_leaks, scenario_errors(model, train_runs), pool,
+                                runner.coords, batch, seed + rnd)
+        for j, idx in enumerate(chosen):
+            leak = pool[idx]
+            train_leaks.append(leak)
+            train_runs.append(runner.run(f"al_{rnd}_{j}", leak))
+            log.append(dict(leak, split="train", round=rnd))
+        pool = [l for i, l in enumerate(pool) if i not in set(chosen)]
+
+    # the returned model was fitted on the first best_size training scenarios only
+    log = pd.DataFrame(log)
+    train_order = (log["split"] == "train").cumsum()
+    log["in_best_model"] = (log["split"] == "train") & (train_order <= best_size)
+    return best_model, best_acc, log
+
+
+# --- main ---
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Adaptive (active-learning) leak scenario generation")
+    parser.add_argument("--inp", type=str, default="simulation/village_model.inp", help="Path to EPANET INP file")
+    parser.add_argument("--out", type=str, default="simulation/data/adaptive", help="Output directory for CSVs")
+    parser.add_argument("--simulator", choices=["wntr", "epanet"], default="wntr", help="Which simulator to use")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION, help="Simulation duration in seconds")
+    parser.add_argument("--sensors", nargs="*", help="Junctions used as pressure sensors (default: all)")
+    parser.add_argument("--init", type=int, default=8, help="Initial Latin-hypercube training scenarios")
+    parser.add_argument("--batch", type=int, default=4, help="Scenarios simulated per round")
+    parser.add_argument("--val", type=int, default=10, help="Held-out validation scenarios")
+    parser.add_argument("--max-sims", type=int, default=100, help="Upper bound on run_sim calls")
+    parser.add_argument("--patience", type=int, default=3, help="Rounds without improvement before stopping")
+    parser.add_argument("--tol", type=float, default=0.005, help="Minimum accuracy gain that counts as improvement")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    # baseline + validation + initial scenarios all run before the first round
+    if 1 + args.val + args.init > args.max_sims:
+        parser.error(f"--max-sims {args.max_sims} is below the 1 + {args.val} + {args.init} "
+                     "run_sim calls needed for the baseline, --val and --init scenarios")
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    logging.getLogger("wntr").setLevel(logging.WARNING)  # per-timestep solver chatter
+    args = parse_args()
+
+    out_dir = Path(args.out)
+    ensure_dir(out_dir)
+    runner = ScenarioRunner(Path(args.inp), out_dir, args.simulator, args.duration, args.sensors)
+    _, acc, log = active_learning(runner, args.init, args.batch, args.val, args.max_sims,
+                                  args.patience, args.tol, args.seed)
+
+    log.to_csv(out_dir / "adaptive_scenarios.csv", index=False)
+    logging.info("Done: best val accuracy %.4f after %d run_sim calls; scenario log in %s",
+                 acc, runner.num_sims, out_dir / "adaptive_scenarios.csv")
+
+
+if __name__ == "__main__":
+    main()
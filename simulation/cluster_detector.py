@@ -0,0 +1,181 @@
+"""
+cluster_detector.py
+
+Network-level leak detection for many clusters (district metered areas) at once.
+
+Two signals, both compared against each cluster's *own* baseline rather than
+against the other clusters:
+  - mass balance: trunk (tank -> cluster) inflow minus the sum of metered house
+    demand; unaccounted-for water shows up as a positive imbalance
+  - minimum night flow (MNF): the lowest inflow inside a night window each day;
+    a slow background leak makes it creep upwards over several days
+
+The mass-balance baseline forgets on a time scale (`mb_half_life_days`), not
+per step, and its noise level comes from step-to-step differences rather than
+deviations from the mean, so a leak that grows over days is neither absorbed
+into the baseline nor mistaken for extra noise.
+
+State is a handful of (num_clusters,) arrays plus a (window_days, num_clusters)
+ring buffer, so each new time step costs O(num_clusters) array work and the
+history is never rescanned.
+
+Usage:
+    detector = ClusterLeakDetector(cluster_names)
+    for t, inflow_row, consumption_row in stream:
+        alerts += detector.update(t, inflow_row, consumption_row)
+"""
+
+import numpy as np
+
+
+DAY = 24 * 3600
+
+
+def cluster_consumption(demand: np.ndarray, house_cluster: np.ndarray, num_clusters: int) -> np.ndarray:
+    """Sum house demands per cluster.
+
+    demand: (houses,) or (time, houses); house_cluster: cluster index of each house.
+    """
+    demand = np.atleast_2d(demand)
+    rows = np.repeat(np.arange(demand.shape[0]), demand.shape[1])
+    cols = np.tile(house_cluster, demand.shape[0])
+    out = np.zeros((demand.shape[0], num_clusters))
+    np.add.at(out, (rows, cols), demand.ravel())
+    return out
+
+
+class ClusterLeakDetector:
+    """Incremental mass-balance + minimum-night-flow detector over all clusters."""
+
+    def __init__(self, clusters: list, night_hours=(2, 4), window_days: int = 7, alpha: float = 0.05,
+                 z_threshold: float = 3.0, warmup_steps: int = 96, warmup_days: int = 3,
+                 min_flow: float = 1e-4, mb_tolerance: float = 0.02, mnf_tolerance: float = 0.05,
+                 mb_half_life_days: float = 14.0):
+        self.clusters = np.asarray(clusters)
+        self.night_start, self.night_end = (h * 3600 for h in night_hours)
+        self.window_days = window_days
+        self.alpha = alpha                    # per-day EWMA weight for the MNF baseline
+        self.mb_half_life = mb_half_life_days * DAY
+        self.z_threshold = z_threshold
+        self.warmup_steps = warmup_steps
+        self.warmup_days = warmup_days
+        self.min_flow = min_flow
+        self.mb_tolerance = mb_tolerance      # std floor for the imbalance fraction
+        self.mnf_tolerance = mnf_tolerance    # std floor as a fraction of baseline MNF
+
+        n = len(self.clusters)
+        self.steps = 0
+        self.last_t = None
+        self.mb_n = np.zeros(n)               # steps folded into each cluster's baseline
+        self.mb_mean = np.zeros(n)
+        self.mb_var = np.zeros(n)             # step-to-step noise variance of the imbalance fraction
+        self.mb_prev = np.full(n, np.nan)
+
+        self.night_min = np.full(n, np.inf)
+        self.in_night = False
+        self.days = 0
+        self.mnf_hist = np.full((window_days, n), np.nan)
+        self.mnf_mean = np.zeros(n)
+        self.mnf_var = np.zeros(n)
+        self.mnf_slope = np.zeros(n)
+
+    # -- helpers --
+
+    def _ewma(self, mean, var, x, mask):
+        """Exponentially weighted mean/variance update, only where mask is True."""
+        delta = x - mean
+        new_mean = mean + self.alpha * delta
+        new_var = (1 - self.alpha) * (var + self.alpha * delta ** 2)
+        return np.where(mask, new_mean, mean), np.where(mask, new_var, var)
+
+    @staticmethod
+    def _z(x, mean, var, floor):
+        """z-score with a noise floor so near-constant baselines don't alarm on rounding."""
+        return (x - mean) / np.sqrt(var + floor ** 2 + 1e-12)
+
+    def _mnf_trend(self) -> np.ndarray:
+        """Least-squares slope of the MNF ring buffer per cluster (flow per day)."""
+        k = min(self.days, self.window_days)
+        order = (np.arange(self.days - k, self.days)) % self.window_days
+        hist = self.mnf_hist[order]
+        x = np.arange(k, dtype=float)[:, None]
+        valid = ~np.isnan(hist)
+        cnt = valid.sum(axis=0)
+        xm = np.where(valid, x, 0).sum(axis=0) / np.maximum(cnt, 1)
+        ym = np.nansum(hist, axis=0) / np.maximum(cnt, 1)
+        dx = np.where(valid, x - xm, 0)
+        dy = np.where(valid, hist - ym, 0)
+        den = (dx ** 2).sum(axis=0)
+        return np.where((cnt >= 2) & (den > 0), (dx * dy).sum(axis=0) / np.where(den > 0, den, 1), 0.0)
+
+    def _close_night(self, t) -> list:
+        mnf = np.where(np.isfinite(self.night_min), self.night_min, np.nan)
+        self.mnf_hist[self.days % self.window_days] = mnf
+        self.days += 1
+        self.night_min[:] = np.inf
+        self.mnf_slope = self._mnf_trend()
+
+        alerts = []
+        if self.days > self.warmup_days:
+            z = self._z(mnf, self.mnf_mean, self.mnf_var, self.mnf_tolerance * np.abs(self.mnf_mean))
+            flagged = (z > self.z_threshold) & (self.mnf_slope > 0)
+            for c in np.flatnonzero(flagged):
+                alerts.append({"Time": t, "Type": "Night Flow Rise", "Target": str(self.clusters[c]), "Value": float(mnf[c])})
+        else:
+            flagged = np.zeros(len(self.clusters), dtype=bool)
+
+        valid = ~np.isnan(mnf) & ~flagged
+        if self.days == 1:
+            self.mnf_mean = np.where(valid, mnf, self.mnf_mean)
+        else:
+            self.mnf_mean, self.mnf_var = self._ewma(self.mnf_mean, self.mnf_var, np.nan_to_num(mnf), valid)
+        return alerts
+
+    # -- public API --
+
+    def update(self, t, inflow, consumption) -> list:
+        """Ingest one time step (arrays over clusters) and return any new alerts."""
+        inflow = np.asarray(inflow, dtype=float)
+        consumption = np.asarray(consumption, dtype=float)
+        alerts = []
+
+        # mass balance vs. this cluster's usual unaccounted-for fraction
+        dt = 0 if self.last_t is None else t - self.last_t
+        self.last_t = t
+        frac = (inflow - consumption) / np.maximum(inflow, self.min_flow)
+        active = inflow > self.min_flow
+        if self.steps >= self.warmup_steps:
+            z = self._z(frac, self.mb_mean, self.mb_var, self.mb_tolerance)
+            flagged = active & (z > self.z_threshold)
+            for c in np.flatnonzero(flagged):
+                alerts.append({"Time": t, "Type": "Mass Imbalance", "Target": str(self.clusters[c]), "Value": float(inflow[c] - consumption[c])})
+        else:
+            flagged = np.zeros(len(self.clusters), dtype=bool)
+        # time-based weight; plain running average until the baseline has enough samples
+        alpha = np.maximum(1 - 0.5 ** (dt / self.mb_half_life), 1 / (self.mb_n + 1))
+        learn = active & ~flagged
+        self.mb_mean = np.where(learn, self.mb_mean + alpha * (frac - self.mb_mean), self.mb_mean)
+        diff = frac - self.mb_prev
+        noisy = learn & ~np.isnan(diff)
+        self.mb_var = np.where(noisy, self.mb_var + alpha * (diff ** 2 / 2 - self.mb_var), self.mb_var)
+        self.mb_prev = np.where(active, frac, np.nan)
+        self.mb_n += learn
+        self.steps += 1
+
+        # minimum night flow: running min inside the window, closed once it ends
+        sec = t % DAY
+        if self.night_start <= sec < self.night_end:
+            self.night_min = np.minimum(self.night_min, inflow)
+            self.in_night = True
+        elif self.in_night:
+            self.in_night = False
+            alerts += self._close_night(t)
+        return alerts
+
+    def update_many(self, times, inflow, consumption) -> list:
+        """Ingest (time, clusters) blocks of steps in order."""
+        alerts = []
+        for t, q_in, q_use in zip(times, inflow, consumption):
+            alerts += self.update(t, q_in, q_use)
+        return alerts
+
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+digital_twin.py
+
+Real-time digital twin for a WNTR/EPANET model. Instead of running a full
+extended-period simulation, the twin keeps one WaterNetworkModel and its
+hydraulic equations in memory and advances them one hydraulic time step at a
+time, driven by incoming sensor readings.
+
+Usage examples:
+    python digital_twin.py --inp simulation/village_model.inp \
+        --demand simulation/data/normal_demand_<ts>.csv \
+        --pressure simulation/data/normal_pressure_<ts>.csv \
+        --out simulation/data/twin_residuals.csv
+
+Features:
+  - Builds the hydraulic model once and warm-starts every Newton solve from
+    the previous step's heads and flows
+  - Overrides junction demands and tank levels with the latest readings
+    (tank levels default to the tank columns of the pressure CSV)
+  - Clamps tanks to their min/max level, disconnects empty tanks and flags
+    them in the result
+  - Publishes predicted-vs-observed pressure residuals to subscribers
+
+Controls and rules in the INP file are not evaluated while stepping; use
+`sim.run_sim()` for networks that depend on them. Tank level limits are
+handled like WNTR's own tank controls, simplified: a tank is held inside
+[min_level, max_level] and reported in `tanks_at_limit`, and an empty tank's
+links are taken out of the network, so junctions it alone supplied read 0 m.
+Feed observed tank levels whenever they are available.
+
+Requirements:
+  pip install wntr pandas numpy
+
+"""
+
+from pathlib import Path
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+import wntr
+from wntr.network import LinkStatus
+from wntr.sim import hydraulics
+from wntr.sim.models import param
+from wntr.sim.solvers import NewtonSolver, SolverStatus
+
+
+# --- configuration ---
+DEFAULT_SOLVER_OPTIONS = {"MAXITER": 50, "TOL": 1e-6}
+
+
+class DigitalTwin:
+    """Step a WaterNetworkModel forward one hydraulic time step at a time.
+
+    readings passed to `step` are plain mappings of node name -> value:
+      demands      junction demand in m^3/s (non-junction names are ignored)
+      tank_levels  tank level above the tank floor in m
+      pressures    observed junction pressure in m (used for residuals only)
+    """
+
+    def __init__(self, wn: wntr.network.WaterNetworkModel, timestep: int = None, solver_options: dict = None):
+        self.wn = wn
+        self.timestep = int(timestep or wn.options.time.hydraulic_timestep)
+        self.solver_options = dict(DEFAULT_SOLVER_OPTIONS, **(solver_options or {}))
+        self._subscribers = []
+
+        self.wn.sim_time = 0
+        self._model, self._model_updater = hydraulics.create_hydraulic_model(wn)
+        self._model.set_structure()
+        self._solver = NewtonSolver(self.solver_options)
+
+        self.junction_names = list(wn.junction_name_list)
+        self.tank_names = list(wn.tank_name_list)
+        self._junction_index = {name: i for i, name in enumerate(self.junction_names)}
+        self._head_vars = [self._model.head[name] for name in self.junction_names]
+        self._elevations = np.array([wn.get_node(name).elevation for name in self.junction_names])
+        self._links = [(name, link.start_node_name, link.end_node_name) for name, link in wn.links()]
+        self._isolated_junctions, self._isolated_links = set(), set()
+        self._first_step = True
+
+    @classmethod
+    def from_inp(cls, inp_path: Path, **kwargs):
+        if not Path(inp_path).exists():
+            raise FileNotFoundError(f"INP file not found: {inp_path}")
+        return cls(wntr.network.WaterNetworkModel(str(inp_path)), **kwargs)
+
+    def subscribe(self, callback):
+        """Register `callback(result)` to be called after every step."""
+        self._subscribers.append(callback)
+
+    def _apply_readings(self, demands: dict, tank_levels: dict):
+        for name, level in (tank_levels or {}).items():
+            if name in self.tank_names:
+                tank = self.wn.get_node(name)
+                tank._head = tank.elevation + float(level)
+        at_limit = self._clamp_tanks()
+
+        param.source_head_param(self._model, self.wn)
+        param.expected_demand_param(self._model, self.wn)
+        for name, q in (demands or {}).items():
+            if name in self._junction_index:
+                self._model.expected_demand[name].value = float(q)
+        return at_limit
+
+    def _clamp_tanks(self) -> dict:
+        """Hold tanks inside [min_level, max_level]; returns {tank: "min" | "max"} for those at a limit."""
+        at_limit = {}
+        for name in self.tank_names:
+            tank = self.wn.get_node(name)
+            low, high = tank.elevation + tank.min_level, tank.elevation + tank.max_level
+            if tank._head <= low:
+                tank._head, at_limit[name] = low, "min"
+            elif tank._head >= high:
+                tank._head, at_limit[name] = high, "max"
+        return at_limit
+
+    def _isolate_empty_tanks(self, empty_tanks: set):
+        """Drop links of empty tanks, and junctions left without a source, from the model."""
+        sources = set(self.wn.reservoir_name_list) | (set(self.tank_names) - empty_tanks)
+        adjacency = {}
+        for name, a, b in self._links:
+            if a in empty_tanks or b in empty_tanks or self.wn.get_link(name).status == LinkStatus.Closed:
+                continue
+            adjacency.setdefault(a, []).append(b)
+            adjacency.setdefault(b, []).append(a)
+        reached, stack = set(sources), list(sources)
+        while stack:
+            for nxt in adjacency.get(stack.pop(), ()):
+                if nxt not in reached:
+                    reached.add(nxt)
+                    stack.append(nxt)
+
+        junctions = set(self.junction_names) - reached
+        links = {name for name, a, b in self._links if {a, b} & (junctions | empty_tanks)}
+        for name in self._isolated_junctions - junctions:
+            self.wn.get_node(name)._is_isolated = False
+        for name in self._isolated_links - links:
+            self.wn.get_link(name)._is_isolated = False
+        for name in junctions:
+            self.wn.get_node(name)._is_isolated = True
+        for name in links:
+            self.wn.get_link(name)._is_isolated = True
+        hydraulics.update_model_for_isolated_junctions_and_links(
+            self._model, self.wn, self._model_updater,
+            self._isolated_junctions, self._isolated_links, junctions, links)
+        if (junctions, links) != (self._isolated_junctions, self._isolated_links):
+            self._model.set_structure()
+        self._isolated_junctions, self._isolated_links = junctions, links
+
+    def predicted_pressure(self) -> np.ndarray:
+        heads = np.fromiter((v.value for v in self._head_vars), dtype=float, count=len(self._head_vars))
+        pressure = heads - self._elevations
+        if self._isolated_junctions:
+            pressure[[self._junction_index[name] for name in self._isolated_junctions]] = 0.0
+        return pressure
+
+    def step(self, demands: dict = None, tank_levels: dict = None, pressures: dict = None) -> dict:
+        """Advance one time step and return predicted pressures and residuals."""
+        if not self._first_step:
+            self.wn.sim_time += self.timestep
+            hydraulics.update_tank_heads(self.wn)
+
+        tanks_at_limit = self._apply_readings(demands, tank_levels)
+        self._isolate_empty_tanks({name for name, limit in tanks_at_limit.items() if limit == "min"})
+        if tanks_at_limit:
+            logging.warning("t=%ds: tanks held at level limits: %s", self.wn.sim_time, tanks_at_limit)
+
+        status, message, iterations = self._solver.solve(self._model)
+        if status != SolverStatus.converged:
+            raise RuntimeError(f"Digital twin did not converge at t={self.wn.sim_time}s: {message}")
+
+        hydraulics.store_results_in_network(self.wn, self._model)
+        hydraulics.update_network_previous_values(self.wn)
+        self._first_step = False
+
+        predicted = pd.Series(self.predicted_pressure(), index=self.junction_names, name="predicted")
+        residuals = pd.Series(dtype=float, name="residual")
+        if pressures:
+            observed = pd.Series(pressures, dtype=float)
+            observed = observed[observed.index.isin(self._junction_index)]
+            residuals = (observed - predicted[observed.index]).rename("residual")
+
+        result = {
+            "time": int(self.wn.sim_time),
+            "iterations": iterations,
+            "predicted": predicted,
+            "residuals": residuals,
+            "tanks_at_limit": tanks_at_limit,
+        }
+        for callback in self._subscribers:
+            callback(result)
+        return result
+
+
+# --- replay ---
+
+def read_readings_csv(path: Path) -> pd.DataFrame:
+    """Read a wide [time x node] CSV as written by generate_leaks.py."""
+    df = pd.read_csv(path, index_col=0)
+    return df.drop(columns=["scenario"], errors="ignore")
+
+
+def replay(twin: DigitalTwin, demand: pd.DataFrame, pressure: pd.DataFrame = None,
+           tank_levels: pd.DataFrame = None) -> pd.DataFrame:
+    """Feed recorded readings through the twin and collect residuals [time x node].
+
+    Tank levels come from `tank_levels` [time x tank] or, if not given, from the
+    tank columns of `pressure` (a tank's pressure is its level).
+    """
+    if tank_levels is None and pressure is not None:
+        tank_levels = pressure[[c for c in pressure.columns if c in twin.tank_names]]
+    rows = {}
+    for t, demand_row in demand.iterrows():
+        observed, levels = None, None
+        if pressure is not None and t in pressure.index:
+            observed = pressure.loc[t].to_dict()
+        if tank_levels is not None and t in tank_levels.index:
+            levels = tank_levels.loc[t].dropna().to_dict()
+        result = twin.step(demands=demand_row.dropna().to_dict(), tank_levels=levels, pressures=observed)
+        rows[result["time"]] = result["residuals"]
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay readings through a step-wise digital twin and export pressure residuals")
+    parser.add_argument("--inp", type=str, default="simulation/village_model.inp", help="Path to EPANET INP file")
+    parser.add_argument("--demand", type=str, required=True, help="Demand CSV [time x junction] used to drive the twin")
+    parser.add_argument("--pressure", type=str, help="Observed pressure CSV [time x node] for residuals (tank columns give tank levels)")
+    parser.add_argument("--tank-levels", type=str, help="Observed tank level CSV [time x tank]; overrides the pressure CSV's tank columns")
+    parser.add_argument("--timestep", type=int, help="Seconds per step (defaults to the INP hydraulic timestep)")
+    parser.add_argument("--out", type=str, default="simulation/data/twin_residuals.csv", help="Output CSV for residuals")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+
+    twin = DigitalTwin.from_inp(Path(args.inp), timestep=args.timestep)
+    demand = read_readings_csv(Path(args.demand))
+    pressure = read_readings_csv(Path(args.pressure)) if args.pressure else None
+    tank_levels = read_readings_csv(Path(args.tank_levels)) if args.tank_levels else None
+
+    residuals = replay(twin, demand, pressure, tank_levels)
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    residuals.to_csv(out_path)
+    logging.info("Replayed %d steps; residuals saved to %s", len(residuals), out_path)
+
+
+if __name__ == "__main__":
+    main()
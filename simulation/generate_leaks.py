@@ -101,6 +101,7 @@ def run_sim_and_save(wn: wntr.network.WaterNetworkModel, scenario_name: str, out
     pressure_meta.to_csv(pressure_file)
 
     logging.info("Saved: %s and %s", demand_file, pressure_file)
+    return results
 
 
 def generate_sample_inp(path: Path):
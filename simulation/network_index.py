@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+network_index.py
+
+Precomputed graph index over a water network export (INP or WNTR JSON) for
+fast upstream/downstream, isolation and affected-customer queries.
+
+Usage examples:
+    python network_index.py --network simulation/village_model.json --closed-link P_Tank_3
+    python network_index.py --network simulation/village_model.inp --downstream C7
+    python network_index.py --network simulation/village_model.json --isolate P_3_2 --valves P_Tank_3
+
+Features:
+  - Built once from the network file and cached next to it as
+    <network>.graph.npz (rebuilt automatically when the network file changes)
+  - Node/link name -> integer maps and CSR adjacency arrays
+  - Dominator trees from every source tank/reservoir over nodes *and* links,
+    so "what loses supply if X is closed?" is a contiguous slice of an array
+  - Isolation segments (connected parts bounded by valves) with their own
+    dominator trees for "which customers are out if we isolate this segment?"
+
+Queries only use NumPy; WNTR is needed only to build the index from an INP file.
+
+Requirements:
+  pip install numpy   (plus wntr for INP input)
+
+"""
+
+from pathlib import Path
+import argparse
+import json
+import logging
+
+import numpy as np
+
+
+# --- configuration ---
+INDEX_SUFFIX = ".graph.npz"
+INDEX_VERSION = 1
+NODE_KINDS = ("Junction", "Tank", "Reservoir")
+SOURCE_KINDS = ("Tank", "Reservoir")
+VALVE_LINK_TYPES = ("Valve", "PRV", "PSV", "PBV", "FCV", "TCV", "GPV")
+
+
+# --- reading the network ---
+
+def _read_json(path: Path):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    nodes = []
+    for n in data["nodes"]:
+        demand = sum(d.get("base_val") or 0.0 for d in n.get("demand_timeseries_list") or [])
+        nodes.append((n["name"], n["node_type"], demand))
+    links = [(l["name"], l["link_type"], l["start_node_name"], l["end_node_name"]) for l in data["links"]]
+    return nodes, links
+
+
+def _read_inp(path: Path):
+    import wntr  # only needed to parse INP files
+
+    wn = wntr.network.WaterNetworkModel(str(path))
+    nodes = []
+    for name, node in wn.nodes():
+        demand = 0.0
+        if node.node_type == "Junction":
+            demand = sum(d.base_value for d in node.demand_timeseries_list)
+        nodes.append((name, node.node_type, demand))
+    links = [(name, link.link_type, link.start_node_name, link.end_node_name) for name, link in wn.links()]
+    return nodes, links
+
+
+def read_network(path: Path):
+    """Return (nodes, links) as plain tuples from an INP or WNTR JSON file."""
+    if path.suffix.lower() == ".json":
+        return _read_json(path)
+    return _read_inp(path)
+
+
+# --- graph helpers (build time only) ---
+
+def _csr(num_vertices: int, src: np.ndarray, dst: np.ndarray, data: np.ndarray = None):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(num_vertices + 1, dtype=np.int64)
+    np.add.at(indptr, src + 1, 1)
+    np.cumsum(indptr, out=indptr)
+    indices = dst[order].astype(np.int32)
+    if data is None:
+        return indptr, indices
+    return indptr, indices, data[order].astype(np.int32)
+
+
+def _components(num_vertices: int, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    label = np.full(num_vertices, -1, dtype=np.int32)
+    current = 0
+    for start in range(num_vertices):
+        if label[start] >= 0:
+            continue
+        label[start] = current
+        stack = [start]
+        while stack:
+            v = stack.pop()
+            for w in indices[indptr[v]:indptr[v + 1]]:
+                if label[w] < 0:
+                    label[w] = current
+                    stack.append(w)
+        current += 1
+    return label
+
+
+def _dominator_tree(num_vertices: int, indptr: np.ndarray, indices: np.ndarray, root: int):
+    """Dominator tree of a symmetric graph from `root` (Cooper-Harvey-Kennedy).
+
+    Returns (idom, tin, tout, order): idom[v] is the immediate dominator
+    (-1 if unreachable), and the vertices dominated by v are order[tin[v]:tout[v]].
+    """
+    postorder = []
+    post_num = np.full(num_vertices, -1, dtype=np.int64)
+    seen = np.zeros(num_vertices, dtype=bool)
+    seen[root] = True
+    stack = [(root, indptr[root])]
+    while stack:
+        v, i = stack[-1]
+        if i < indptr[v + 1]:
+            stack[-1] = (v, i + 1)
+            w = indices[i]
+            if not seen[w]:
+                seen[w] = True
+                stack.append((w, indptr[w]))
+        else:
+            stack.pop()
+            post_num[v] = len(postorder)
+            postorder.append(v)
+
+    idom = np.full(num_vertices, -1, dtype=np.int64)
+    idom[root] = root
+    rpo = postorder[::-1]
+
+    def intersect(a, b):
+        while a != b:
+            while post_num[a] < post_num[b]:
+                a = idom[a]
+            while post_num[b] < post_num[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for v in rpo[1:]:
+            new = -1
+            for p in indices[indptr[v]:indptr[v + 1]]:
+                if idom[p] >= 0:
+                    new = p if new < 0 else intersect(p, new)
+            if idom[v] != new:
+                idom[v] = new
+                changed = True
+
+    children = [[] for _ in range(num_vertices)]
+    for v in rpo[1:]:
+        children[idom[v]].append(v)
+
+    tin = np.full(num_vertices, -1, dtype=np.int32)
+    tout = np.full(num_vertices, -1, dtype=np.int32)
+    order = []
+    stack = [(root, False)]
+    while stack:
+        v, done = stack.pop()
+        if done:
+            tout[v] = len(order)
+            continue
+        tin[v] = len(order)
+        order.append(v)
+        stack.append((v, True))
+        stack.extend((c, False) for c in reversed(children[v]))
+
+    idom[root] = -1
+    return idom.astype(np.int32), tin, tout, np.asarray(order, dtype=np.int32)
+
+
+def _stack_dominators(trees: list, num_vertices: int) -> dict:
+    """Pack one dominator tree per source into rectangular arrays."""
+    k = len(trees)
+    idom = np.full((k, num_vertices), -1, dtype=np.int32)
+    tin = np.full((k, num_vertices), -1, dtype=np.int32)
+    tout = np.full((k, num_vertices), -1, dtype=np.int32)
+    order = np.full((k, num_vertices), -1, dtype=np.int32)
+    for i, (d, a, b, o) in enumerate(trees):
+        idom[i], tin[i], tout[i] = d, a, b
+        order[i, :len(o)] = o
+    return {"idom": idom, "tin": tin, "tout": tout, "order": order}
+
+
+# --- index ---
+
+def build_index_arrays(nodes: list, links: list, valves: list = None) -> dict:
+    """Compute every array stored in the index from plain node/link tuples."""
+    node_names = np.array([n[0] for n in nodes], dtype=str)
+    link_names = np.array([l[0] for l in links], dtype=str)
+    node_id = {name: i for i, name in enumerate(node_names)}
+    n_nodes, n_links = len(node_names), len(link_names)
+
+    node_kind = np.array([NODE_KINDS.index(n[1]) for n in nodes], dtype=np.int8)
+    customer = np.array([n[1] == "Junction" and n[2] > 0 for n in nodes], dtype=bool)
+    link_start = np.array([node_id[l[2]] for l in links], dtype=np.int32)
+    link_end = np.array([node_id[l[3]] for l in links], dtype=np.int32)
+    sources = np.flatnonzero(np.isin(node_kind, [NODE_KINDS.index(k) for k in SOURCE_KINDS])).astype(np.int32)
+
+    # node adjacency: node -> (neighbour node, via link)
+    src = np.concatenate([link_start, link_end])
+    dst = np.concatenate([link_end, link_start])
+    via = np.concatenate([np.arange(n_links), np.arange(n_links)])
+    indptr, indices, edge_link = _csr(n_nodes, src, dst, via)
+    component = _components(n_nodes, indptr, indices)
+
+    # node+link vertex graph (link j is vertex n_nodes + j) so links can dominate nodes
+    n_vertices = n_nodes + n_links
+    link_vertex = n_nodes + np.arange(n_links)
+    v_src = np.concatenate([link_start, link_vertex, link_end, link_vertex])
+    v_dst = np.concatenate([link_vertex, link_start, link_vertex, link_end])
+    v_indptr, v_indices = _csr(n_vertices, v_src, v_dst)
+    dom = _stack_dominators([_dominator_tree(n_vertices, v_indptr, v_indices, s) for s in sources], n_vertices)
+
+    # isolation segments: components once valve links are removed
+    valve_set = set(valves or [])
+    is_valve = np.array([l[1] in VALVE_LINK_TYPES or l[0] in valve_set for l in links], dtype=bool)
+    keep = ~is_valve
+    s_indptr, s_indices = _csr(n_nodes, np.concatenate([link_start[keep], link_end[keep]]),
+                               np.concatenate([link_end[keep], link_start[keep]]))
+    seg_of_node = _components(n_nodes, s_indptr, s_indices)
+    seg_of_link = np.where(is_valve, -1, seg_of_node[link_start]).astype(np.int32)
+    n_segments = int(seg_of_node.max()) + 1 if n_nodes else 0
+
+    # segment graph: segments connected by valves
+    g_src = np.concatenate([seg_of_node[link_start[is_valve]], seg_of_node[link_end[is_valve]]])
+    g_dst = np.concatenate([seg_of_node[link_end[is_valve]], seg_of_node[link_start[is_valve]]])
+    g_indptr, g_indices = _csr(n_segments, g_src, g_dst)
+    source_segments = seg_of_node[sources]
+    seg_dom = _stack_dominators([_dominator_tree(n_segments, g_indptr, g_indices, s) for s in source_segments],
+                                n_segments)
+
+    # per-segment member lists in CSR form
+    seg_node_ptr, seg_nodes = _csr(n_segments, seg_of_node, np.arange(n_nodes))
+    seg_links_mask = seg_of_link >= 0
+    seg_link_ptr, seg_links = _csr(n_segments, seg_of_link[seg_links_mask], np.flatnonzero(seg_links_mask))
+
+    arrays = {
+        "version": np.array(INDEX_VERSION),
+        "node_names": node_names, "link_names": link_names,
+        "node_kind": node_kind, "customer": customer,
+        "link_start": link_start, "link_end": link_end, "is_valve": is_valve,
+        "sources": sources, "component": component,
+        "indptr": indptr, "indices": indices, "edge_link": edge_link,
+        "seg_of_node": seg_of_node, "seg_of_link": seg_of_link,
+        "seg_node_ptr": seg_node_ptr, "seg_nodes": seg_nodes,
+        "seg_link_ptr": seg_link_ptr, "seg_links": seg_links,
+    }
+    arrays.update({f"dom_{k}": v for k, v in dom.items()})
+    arrays.update({f"seg_dom_{k}": v for k, v in seg_dom.items()})
+    return arrays
+
+
+class NetworkIndex:
+    """Read-only graph index; see module docstring for the available queries."""
+
+    def __init__(self, arrays: dict):
+        self.__dict__.update(arrays)
+        self.node_id = {name: i for i, name in enumerate(self.node_names.tolist())}
+        self.link_id = {name: i for i, name in enumerate(self.link_names.tolist())}
+        self.num_nodes = len(self.node_names)
+        self.customer_ids = np.flatnonzero(self.customer)
+
+    # -- construction / caching --
+
+    @classmethod
+    def build(cls, network_path: Path, valves: list = None):
+        nodes, links = read_network(Path(network_path))
+        return cls(build_index_arrays(nodes, links, valves))
+
+    @staticmethod
+    def cache_path(network_path: Path) -> Path:
+        network_path = Path(network_path)
+        return network_path.with_name(network_path.name + INDEX_SUFFIX)
+
+    @classmethod
+    def load(cls, network_path: Path, valves: list = None, rebuild: bool = False):
+        """Load the cached index next to `network_path`, rebuilding it if stale."""
+        network_path = Path(network_path)
+        cache = cls.cache_path(network_path)
+        stat = network_path.stat()
+        stamp = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+        valve_key = np.array(sorted(valves or []), dtype=str)
+
+        if cache.exists() and not rebuild:
+            with np.load(cache, allow_pickle=False) as data:
+                arrays = {k: data[k] for k in data.files}
+            if (int(arrays.pop("version")) == INDEX_VERSION
+                    and np.array_equal(arrays.pop("source_stamp"), stamp)
+                    and np.array_equal(arrays.pop("valve_key"), valve_key)):
+                arrays["version"] = np.array(INDEX_VERSION)
+                return cls(arrays)
+            logging.info("Graph index %s is stale; rebuilding", cache)
+
+        nodes, links = read_network(network_path)
+        arrays = build_index_arrays(nodes, links, valves)
+        np.savez_compressed(cache, source_stamp=stamp, valve_key=valve_key, **arrays)
+        logging.info("Graph index written to %s", cache)
+        return cls(arrays)
+
+    # -- helpers --
+
+    def _vertex(self, name: str) -> int:
+        if name in self.node_id:
+            return self.node_id[name]
+        if name in self.link_id:
+            return self.num_nodes + self.link_id[name]
+        raise KeyError(f"Unknown node or link: {name}")
+
+    def _node_mask(self, vertices: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        mask[vertices[vertices < self.num_nodes]] = True
+        return mask
+
+    def _lost_mask(self, tin, tout, order, v) -> np.ndarray:
+        """Mask of vertices that lose every source when vertex v is removed."""
+        reach = tin >= 0
+        lost = np.ones(tin.shape[1], dtype=bool)
+        for k in range(tin.shape[0]):
+            dominated = np.zeros(tin.shape[1], dtype=bool)
+            if tin[k, v] >= 0:
+                dominated[order[k, tin[k, v]:tout[k, v]]] = True
+            lost &= ~reach[k] | dominated
+        return lost & reach.any(axis=0)
+
+    # -- queries --
+
+    def neighbours(self, node: str) -> list:
+        i = self.node_id[node]
+        return self.node_names[self.indices[self.indptr[i]:self.indptr[i + 1]]].tolist()
+
+    def reachable(self, a: str, b: str) -> bool:
+        """True if nodes a and b are hydraulically connected (all links open)."""
+        return bool(self.component[self.node_id[a]] == self.component[self.node_id[b]])
+
+    def downstream(self, name: str, source: str = None) -> list:
+        """Nodes that can only be supplied through node/link `name`."""
+        v = self._vertex(name)
+        if source is None:
+            lost = self._lost_mask(self.dom_tin, self.dom_tout, self.dom_order, v)
+            mask = lost[:self.num_nodes]
+        else:
+            k = int(np.flatnonzero(self.sources == self.node_id[source])[0])
+            if self.dom_tin[k, v] < 0:
+                return []
+            mask = self._node_mask(self.dom_order[k, self.dom_tin[k, v]:self.dom_tout[k, v]])
+        if v < self.num_nodes:
+            mask[v] = False
+        return self.node_names[mask].tolist()
+
+    def upstream(self, name: str, source: str = None) -> list:
+        """Nodes every path from `source` (default: first source) to `name` passes through."""
+        k = 0 if source is None else int(np.flatnonzero(self.sources == self.node_id[source])[0])
+        idom = self.dom_idom[k]
+        chain = []
+        v = idom[self._vertex(name)]
+        while v >= 0:
+            if v < self.num_nodes:
+                chain.append(str(self.node_names[v]))
+            v = idom[v]
+        return chain
+
+    def affected_customers(self, name: str) -> list:
+        """Customers that lose supply when node/link `name` is closed."""
+        v = self._vertex(name)
+        lost = self._lost_mask(self.dom_tin, self.dom_tout, self.dom_order, v)[:self.num_nodes]
+        if v < self.num_nodes:
+            lost[v] = True
+        return self.node_names[lost & self.customer].tolist()
+
+    def isolation_segment(self, name: str) -> dict:
+        """Nodes, links and bounding valves of the segment containing `name`."""
+        v = self._vertex(name)
+        if v < self.num_nodes:
+            seg = self.seg_of_node[v]
+        else:
+            seg = self.seg_of_link[v - self.num_nodes]
+            if seg < 0:
+                raise ValueError(f"{name} is a valve and does not belong to a segment")
+        nodes = self.seg_nodes[self.seg_node_ptr[seg]:self.seg_node_ptr[seg + 1]]
+        links = self.seg_links[self.seg_link_ptr[seg]:self.seg_link_ptr[seg + 1]]
+        touching = self.is_valve & ((self.seg_of_node[self.link_start] == seg) |
+                                    (self.seg_of_node[self.link_end] == seg))
+        return {
+            "segment": int(seg),
+            "nodes": self.node_names[nodes].tolist(),
+            "links": self.link_names[links].tolist(),
+            "valves": self.link_names[touching].tolist(),
+        }
+
+    def segment_affected_customers(self, name: str) -> list:
+        """Customers out of supply when the segment containing `name` is isolated."""
+        seg = self.isolation_segment(name)["segment"]
+        lost_segments = self._lost_mask(self.seg_dom_tin, self.seg_dom_tout, self.seg_dom_order, seg)
+        lost_segments[seg] = True
+        return self.node_names[lost_segments[self.seg_of_node] & self.customer].tolist()
+
+
+# --- main ---
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build/query the cached network graph index")
+    parser.add_argument("--network", type=str, default="simulation/village_model.json", help="Path to INP or WNTR JSON file")
+    parser.add_argument("--valves", nargs="*", help="Extra link names to treat as isolation valves")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore any cached index")
+    parser.add_argument("--closed-link", help="List customers that lose supply if this link/node is closed")
+    parser.add_argument("--downstream", help="List nodes downstream of this node/link")
+    parser.add_argument("--isolate", help="Show the isolation segment containing this node/link")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+
+    index = NetworkIndex.load(Path(args.network), valves=args.valves, rebuild=args.rebuild)
+    logging.info("Index: %d nodes, %d links, %d sources", index.num_nodes, len(index.link_names), len(index.sources))
+
+    if args.closed_link:
+        logging.info("Closing %s cuts off: %s", args.closed_link, index.affected_customers(args.closed_link))
+    if args.downstream:
+        logging.info("Downstream of %s: %s", args.downstream, index.downstream(args.downstream))
+    if args.isolate:
+        logging.info("Segment: %s", index.isolation_segment(args.isolate))
+        logging.info("Customers out: %s", index.segment_affected_customers(args.isolate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+rollups.py
+
+Multi-resolution min/max/mean/count rollups of simulation results and sensor
+readings, so long horizons can be viewed without re-aggregating every raw step.
+
+Usage examples:
+    python rollups.py --csv simulation/data/network_results.csv
+    python rollups.py --csv simulation/data/cluster_flows.csv --start 0 --end 604800 --points 500
+
+Features:
+  - One pyramid level per resolution (default 1 min, 15 min, 1 h, 1 day); every
+    level is aggregated from the raw steps, so all levels are exact
+  - Incremental: append() folds new steps into the last open bucket of each
+    level and only aggregates the new rows; nothing already rolled up is rescanned
+  - Stored in a <csv>.rollups/ directory next to the source CSV: one append-only
+    file of fixed-size records per level (float32 min/max, float64 sums so means
+    stay exact across appends, uint32 counts) plus a small state.npz holding each
+    level's still-open last bucket. save() only appends the buckets closed since
+    the last save and rewrites state.npz, so its cost doesn't grow with history
+  - Rollups.open() resumes appending from state.npz alone; Rollups.load() also
+    reads the level files for querying
+  - query() picks the finest level whose bucket count over the requested time
+    range fits the point budget, i.e. never coarser than it has to be
+
+Queries only use NumPy; pandas is needed only to read the result CSVs.
+
+Requirements:
+  pip install numpy pandas
+
+"""
+
+from pathlib import Path
+import argparse
+import logging
+import os
+import shutil
+
+import numpy as np
+
+
+# --- configuration ---
+ROLLUP_SUFFIX = ".rollups"
+STATE_FILE = "state.npz"
+RESOLUTIONS = (60, 15 * 60, 3600, 24 * 3600)   # seconds
+
+
+def _record_dtype(num_series: int) -> np.dtype:
+    """One bucket of one level: its start time plus per-series aggregates."""
+    return np.dtype([
+        ("start", "<i8"),
+        ("count", "<u4", (num_series,)),
+        ("sum", "<f8", (num_series,)),
+        ("min", "<f4", (num_series,)),
+        ("max", "<f4", (num_series,)),
+    ])
+
+
+# --- one pyramid level ---
+
+class _Level:
+    """Growable bucket records for one resolution (amortised O(1) appends).
+
+    rows[:persisted] are already in the level file; the last row is the open
+    bucket and is only ever kept in state.npz. `offset` counts file rows that
+    were never read back (handles from Rollups.open()).
+    """
+
+    def __init__(self, resolution: int, num_series: int, capacity: int = 64):
+        self.resolution = int(resolution)
+        self.dtype = _record_dtype(num_series)
+        self.rows = np.empty(capacity, dtype=self.dtype)
+        self.size = 0
+        self.persisted = 0
+        self.offset = 0
+
+    def __getattr__(self, field):
+        # start / count / sum / min / max views of the filled rows
+        if field in ("start", "count", "sum", "min", "max"):
+            return self.rows[field][:self.size]
+        raise AttributeError(field)
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.rows):
+            return
+        rows = np.empty(max(needed, 2 * len(self.rows)), dtype=self.dtype)
+        rows[:self.size] = self.rows[:self.size]
+        self.rows = rows
+
+    def extend(self, records: np.ndarray):
+        self._reserve(len(records))
+        self.rows[self.size:self.size + len(records)] = records
+        self.size += len(records)
+
+    def append(self, times: np.ndarray, values: np.ndarray):
+        """Aggregate (time,) / (time, series) steps, already in time order."""
+        buckets = times // self.resolution * self.resolution
+        first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        valid = ~np.isnan(values)
+        new = np.empty(len(first), dtype=self.dtype)
+        new["start"] = buckets[first]
+        new["count"] = np.add.reduceat(valid, first, axis=0)
+        new["sum"] = np.add.reduceat(np.where(valid, values, 0.0), first, axis=0)
+        new["min"] = np.minimum.reduceat(np.where(valid, values, np.inf), first, axis=0)
+        new["max"] = np.maximum.reduceat(np.where(valid, values, -np.inf), first, axis=0)
+
+        # the first new bucket may continue the last stored one
+        if self.size and new["start"][0] == self.rows["start"][self.size - 1]:
+            last = self.rows[self.size - 1:self.size]
+            last["count"] += new["count"][0]
+            last["sum"] += new["sum"][0]
+            last["min"] = np.minimum(last["min"], new["min"][0])
+            last["max"] = np.maximum(last["max"], new["max"][0])
+            new = new[1:]
+        self.extend(new)
+
+    def closed_since_save(self) -> np.ndarray:
+        return self.rows[self.persisted:max(self.size - 1, self.persisted)]
+
+    def tail(self) -> np.ndarray:
+        return self.rows[max(self.size - 1, 0):self.size]
+
+
+# --- public API ---
+
+class Rollups:
+    """Min/max/mean/count pyramid over many named series sharing one time axis."""
+
+    def __init__(self, series: list, resolutions=RESOLUTIONS):
+        self.series = np.asarray([str(s) for s in series])
+        self.resolutions = tuple(sorted(int(r) for r in resolutions))
+        self.levels = [_Level(r, len(self.series)) for r in self.resolutions]
+        self.last_time = None
+        self._column = {name: i for i, name in enumerate(self.series)}
+        self._path = None   # directory these levels were read from / last saved to
+
+    def append(self, times, values):
+        """
+        Fold new steps into every level.
+
+        Args:
+            times: (n,) seconds, strictly increasing and after the last appended step
+            values: (n, num_series) readings; NaN means "no reading" and is not counted
+        """
+        times = np.atleast_1d(np.asarray(times)).astype(np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(times), len(self.series))
+        if not len(times):
+            return
+        if np.any(np.diff(times) <= 0) or (self.last_time is not None and times[0] <= self.last_time):
+            raise ValueError("times must be increasing and after the last appended step")
+        for level in self.levels:
+            level.append(times, values)
+        self.last_time = int(times[-1])
+
+    def pick_level(self, start=None, end=None, max_points: int = 1000) -> int:
+        """Index of the finest level with at most max_points buckets in [start, end)."""
+        for i, level in enumerate(self.levels):
+            lo, hi = self._bounds(level, start, end)
+            if hi - lo <= max_points:
+                return i
+        return len(self.levels) - 1
+
+    def query(self, start=None, end=None, max_points: int = 1000, series=None, level: int = None) -> dict:
+        """
+        Rolled-up values for [start, end) at the finest level that fits max_points.
+
+        Returns a dict with the chosen resolution, the series names, bucket start
+        times (k,) and min/max/mean/count arrays (k, len(series)); buckets without
+        readings have NaN min/max/mean.
+        """
+        if any(lvl.offset for lvl in self.levels):
+            raise RuntimeError("Rollups opened for appending only; use Rollups.load() to query")
+        if level is None:
+            level = self.pick_level(start, end, max_points)
+        lvl = self.levels[level]
+        lo, hi = self._bounds(lvl, start, end)
+        names = self.series if series is None else np.asarray([str(s) for s in series])
+        cols = [self._column[name] for name in names]
+
+        count = lvl.count[lo:hi][:, cols]
+        empty = count == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = lvl.sum[lo:hi][:, cols] / count
+        return {
+            "resolution": lvl.resolution,
+            "series": names.tolist(),
+            "time": lvl.start[lo:hi].copy(),
+            "min": np.where(empty, np.nan, lvl.min[lo:hi][:, cols]),
+            "max": np.where(empty, np.nan, lvl.max[lo:hi][:, cols]),
+            "mean": np.where(empty, np.nan, mean),
+            "count": count,
+        }
+
+    @staticmethod
+    def _bounds(level: _Level, start, end):
+        starts = level.start
+        lo = 0 if start is None else np.searchsorted(starts, start // level.resolution * level.resolution)
+        hi = level.size if end is None else np.searchsorted(starts, end, side="left")
+        return int(lo), int(hi)
+
+    # -- persistence --
+
+    def save(self, path: Path, keep_history: bool = True):
+        """
+        Persist to a rollup directory, appending only buckets closed since the last save.
+
+        A rollup directory that this object wasn't read from or saved to before
+        is replaced; any other existing, non-empty path raises FileExistsError.
+        With keep_history=False, saved buckets are dropped from memory (for
+        long-running writers that never query).
+        """
+        path = Path(path)
+        fresh = self._path != path
+        if fresh:
+            if path.exists():
+                _clear_rollup_dir(path)
+            path.mkdir(parents=True, exist_ok=True)
+
+        file_rows = []
+        for i, level in enumerate(self.levels):
+            closed = level.closed_since_save()
+            with open(path / f"level{i}.bin", "ab") as f:
+                f.write(closed.tobytes())
+            level.persisted += len(closed)
+            file_rows.append(level.offset + level.persisted)
+            if not keep_history:
+                tail = level.tail().copy()
+                level.offset, level.persisted, level.size = file_rows[-1], 0, 0
+                level.extend(tail)
+
+        # level files are only trusted up to the row counts recorded here
+        state = {
+            "series": self.series,
+            "resolutions": np.asarray(self.resolutions, dtype=np.int64),
+            "last_time": np.int64(-1 if self.last_time is None else self.last_time),
+            "file_rows": np.asarray(file_rows, dtype=np.int64),
+        }
+        for i, level in enumerate(self.levels):
+            state[f"tail{i}"] = level.tail()
+        tmp = path / (STATE_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp, path / STATE_FILE)
+        self._path = path
+
+    @classmethod
+    def open(cls, path: Path, history: bool = False):
+        """Resume from a rollup directory; with history=False only state.npz is read."""
+        path = Path(path)
+        with np.load(path / STATE_FILE, allow_pickle=False) as state:
+            rollups = cls(state["series"].tolist(), state["resolutions"].tolist())
+            last_time = int(state["last_time"])
+            file_rows = state["file_rows"].tolist()
+            tails = [state[f"tail{i}"] for i in range(len(rollups.levels))]
+
+        for i, (level, rows, tail) in enumerate(zip(rollups.levels, file_rows, tails)):
+            level_file = path / f"level{i}.bin"
+            # drop records an interrupted save appended after the last state.npz
+            if level_file.stat().st_size > rows * level.dtype.itemsize:
+                os.truncate(level_file, rows * level.dtype.itemsize)
+            if history:
+                level.extend(np.fromfile(level_file, dtype=level.dtype, count=rows))
+                level.persisted = rows
+            else:
+                level.offset = rows
+            level.extend(tail.astype(level.dtype))
+        rollups.last_time = None if last_time < 0 else last_time
+        rollups._path = path
+        return rollups
+
+    @classmethod
+    def load(cls, path: Path):
+        """Read every level for querying (and further appends)."""
+        return cls.open(path, history=True)
+
+
+def _clear_rollup_dir(path: Path):
+    """Remove an old rollup directory before a fresh save; refuse to touch anything else."""
+    if path.is_dir() and not any(path.iterdir()):
+        return
+    if path.is_dir() and path.name.endswith(ROLLUP_SUFFIX) and (path / STATE_FILE).exists():
+        shutil.rmtree(path)
+        return
+    raise FileExistsError(f"{path} exists and is not a rollup directory; refusing to overwrite it")
+
+
+# --- result CSVs ---
+
+def rollup_path(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + ROLLUP_SUFFIX)
+
+
+def _series_names(columns) -> list:
+    """'Pressure/J1' for MultiIndex (network_results.csv) columns, else the column name."""
+    return ["/".join(map(str, c)) if isinstance(c, tuple) else str(c) for c in columns]
+
+
+def _index_seconds(index) -> np.ndarray:
+    """Frame index as int64 seconds: integer seconds as-is, datetimes as seconds since the epoch."""
+    import pandas as pd
+
+    if isinstance(index, pd.DatetimeIndex):
+        return index.as_unit("ns").asi8 // 10**9
+    if pd.api.types.is_integer_dtype(index):
+        return np.asarray(index, dtype=np.int64)
+    raise TypeError(f"index must be integer seconds or datetimes, not {index.dtype}")
+
+
+def update_frame(df, path: Path, resolutions=RESOLUTIONS, rebuild: bool = False) -> Rollups:
+    """Append the rows of a [time x series] DataFrame newer than the stored rollups and save.
+
+    Only state.npz is read and only new buckets are written, so the cost is
+    proportional to the new rows. Use rebuild=True when the frame replaces
+    (rather than extends) the data rolled up so far; without it, a frame whose
+    columns differ from the stored series raises ValueError.
+    """
+    path = Path(path)
+    names = _series_names(df.columns)
+    times = _index_seconds(df.index)
+    rollups = Rollups.open(path) if (path / STATE_FILE).exists() and not rebuild else None
+    if rollups is not None and rollups.series.tolist() != names:
+        raise ValueError(f"{path} holds different series than the frame; use rebuild=True to replace it")
+    if rollups is None:
+        rollups = Rollups(names, resolutions)
+    new = times > (-1 if rollups.last_time is None else rollups.last_time)
+    if new.any() or rollups._path != path:
+        rollups.append(times[new], df.to_numpy(dtype=np.float64)[new])
+        rollups.save(path, keep_history=False)
+    logging.info("Rollups %s: %d new steps, levels %s", path, int(new.sum()),
+                 {lvl.resolution: lvl.offset + lvl.size for lvl in rollups.levels})
+    return rollups
+
+
+def update_csv(csv_path, resolutions=RESOLUTIONS, rebuild: bool = False) -> Rollups:
+    """Bring <csv>.rollups/ up to date with a result CSV written by village_model.py."""
+    import pandas as pd
+
+    header = [0, 1] if Path(csv_path).name == "network_results.csv" else 0
+    df = pd.read_csv(csv_path, header=header, index_col=0)
+    if not pd.api.types.is_numeric_dtype(df.index):   # timestamp strings
+        df.index = pd.to_datetime(df.index)
+    return update_frame(df, rollup_path(csv_path), resolutions, rebuild)
+
+
+# --- main ---
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build/update and query multi-resolution rollups of result CSVs")
+    parser.add_argument("--csv", type=str, default="simulation/data/network_results.csv", help="Result CSV [time x series], time in seconds or timestamps")
+    parser.add_argument("--start", type=int, help="Query start (seconds)")
+    parser.add_argument("--end", type=int, help="Query end (seconds, exclusive)")
+    parser.add_argument("--points", type=int, default=1000, help="Point budget per series")
+    parser.add_argument("--series", nargs="*", help="Series to query (e.g. Pressure/H1_1 or Cluster3)")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore any stored rollups")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+
+    update_csv(args.csv, rebuild=args.rebuild)
+    result = Rollups.load(rollup_path(args.csv)).query(args.start, args.end, args.points, series=args.series)
+    logging.info("Query -> %ds buckets, %d points x %d series", result["resolution"], len(result["time"]), len(result["series"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from cluster_detector import DAY, ClusterLeakDetector, cluster_consumption
+
+LEAKY, LEAK_START_DAY = 4, 3
+
+
+def slow_leak_alerts(growth_per_day, days=21, step=900, seed=0):
+    """Mass-balance alerts for 10 clusters where one leak grows by `growth_per_day` of usage per day."""
+    rng = np.random.default_rng(seed)
+    n = 10
+    times = np.arange(0, days * DAY, step)
+    usage = 0.01 * (1 + 0.5 * np.sin(2 * np.pi * (times % DAY) / DAY))[:, None] * rng.uniform(0.8, 1.2, n)
+    usage *= 1 + 0.05 * rng.normal(size=usage.shape)
+    background = 0.05 * usage * (1 + 0.2 * rng.normal(size=usage.shape))
+    inflow = usage + background
+    inflow[:, LEAKY] += growth_per_day * np.maximum(times / DAY - LEAK_START_DAY, 0) * usage[:, LEAKY]
+
+    clusters = [f"Cluster{c}" for c in range(n)]
+    alerts = ClusterLeakDetector(clusters).update_many(times, inflow, usage)
+    return [a for a in alerts if a["Type"] == "Mass Imbalance"], clusters[LEAKY]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_slow_leak_is_detected_without_false_alerts(seed):
+    alerts, leaky = slow_leak_alerts(growth_per_day=0.01, seed=seed)
+    hits = [a["Time"] / DAY for a in alerts if a["Target"] == leaky]
+    assert hits, "slow leak was not detected"
+    assert LEAK_START_DAY < min(hits) < 15
+    assert all(a["Target"] == leaky for a in alerts)
+
+
+def test_no_leak_no_alerts():
+    alerts, _ = slow_leak_alerts(growth_per_day=0.0)
+    assert alerts == []
+
+
+def test_cluster_consumption_sums_houses_per_cluster():
+    demand = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+    out = cluster_consumption(demand, np.array([0, 1, 0]), num_clusters=3)
+    np.testing.assert_allclose(out, [[4.0, 2.0, 0.0], [10.0, 5.0, 0.0]])
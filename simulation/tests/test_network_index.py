@@ -0,0 +1,86 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from network_index import NetworkIndex, build_index_arrays, read_network
+
+VILLAGE = Path(__file__).resolve().parents[1] / "village_model.json"
+
+# T1 -> A -> B -> {C, D}, with a loop B - C - D so neither C nor D hangs off a single pipe
+NODES = [("T1", "Tank", 0.0), ("A", "Junction", 0.0), ("B", "Junction", 1.0),
+         ("C", "Junction", 1.0), ("D", "Junction", 1.0), ("E", "Junction", 1.0)]
+LINKS = [("P1", "Pipe", "T1", "A"), ("V1", "Valve", "A", "B"), ("P2", "Pipe", "B", "C"),
+         ("P3", "Pipe", "B", "D"), ("P4", "Pipe", "C", "D"), ("P5", "Pipe", "D", "E")]
+
+
+@pytest.fixture
+def small():
+    return NetworkIndex(build_index_arrays(NODES, LINKS))
+
+
+@pytest.fixture(scope="module")
+def village(tmp_path_factory):
+    path = tmp_path_factory.mktemp("net") / VILLAGE.name
+    shutil.copy(VILLAGE, path)
+    return path
+
+
+def unsupplied_customers(nodes, links, closed):
+    """Brute force: customers with no open path to any source once `closed` is removed."""
+    adj = {n[0]: [] for n in nodes}
+    for name, _, a, b in links:
+        if closed not in (name, a, b):
+            adj[a].append(b)
+            adj[b].append(a)
+    seen = {n[0] for n in nodes if n[1] in ("Tank", "Reservoir") and n[0] != closed}
+    stack = list(seen)
+    while stack:
+        for m in adj[stack.pop()]:
+            if m not in seen and m != closed:
+                seen.add(m)
+                stack.append(m)
+    return sorted(n[0] for n in nodes if n[1] == "Junction" and n[2] > 0 and n[0] not in seen)
+
+
+def test_downstream_and_upstream(small):
+    assert sorted(small.downstream("V1")) == ["B", "C", "D", "E"]
+    assert sorted(small.downstream("B")) == ["C", "D", "E"]
+    assert small.downstream("P2") == []
+    assert small.downstream("D") == ["E"]
+    assert small.upstream("E") == ["D", "B", "A", "T1"]
+
+
+def test_affected_customers_include_the_closed_node(small):
+    assert small.affected_customers("P4") == []
+    assert small.affected_customers("D") == ["D", "E"]
+
+
+def test_isolation_segments_split_at_valves(small):
+    seg = small.isolation_segment("C")
+    assert sorted(seg["nodes"]) == ["B", "C", "D", "E"]
+    assert seg["valves"] == ["V1"]
+    with pytest.raises(ValueError):
+        small.isolation_segment("V1")
+    assert sorted(small.segment_affected_customers("A")) == ["B", "C", "D", "E"]
+
+
+def test_village_closures_match_brute_force(village):
+    nodes, links = read_network(village)
+    index = NetworkIndex.load(village)
+    for name in [l[0] for l in links] + [n[0] for n in nodes if n[1] == "Junction"]:
+        assert sorted(index.affected_customers(name)) == unsupplied_customers(nodes, links, name), name
+
+
+def test_load_reuses_cache_and_rebuilds_on_new_valves(village):
+    first = NetworkIndex.load(village, rebuild=True)
+    cache = NetworkIndex.cache_path(village)
+    assert cache.exists()
+    stamp = cache.stat().st_mtime_ns
+    again = NetworkIndex.load(village)
+    assert cache.stat().st_mtime_ns == stamp
+    np.testing.assert_array_equal(first.dom_order, again.dom_order)
+
+    valved = NetworkIndex.load(village, valves=["P_Tank_3"])
+    assert "P_Tank_3" in valved.isolation_segment("C7")["valves"]
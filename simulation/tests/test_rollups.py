@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import STATE_FILE, Rollups, update_frame
+
+RESOLUTIONS = (60, 900, 3600)
+
+
+def sample_frame(steps=5000, step=30, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(steps, 3))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=np.arange(steps) * step, columns=["a", "b", "c"])
+
+
+def assert_same_rollups(left, right):
+    for i in range(len(left.levels)):
+        ql, qr = left.query(level=i), right.query(level=i)
+        assert ql["resolution"] == qr["resolution"]
+        np.testing.assert_array_equal(ql["time"], qr["time"])
+        np.testing.assert_array_equal(ql["count"], qr["count"])
+        for key in ("min", "max", "mean"):
+            np.testing.assert_allclose(ql[key], qr[key], rtol=1e-6, equal_nan=True)
+
+
+def test_incremental_saves_match_a_single_build(tmp_path):
+    df = sample_frame()
+    path = tmp_path / "series.rollups"
+    for stop in (7, 1234, 1235, 3001, len(df)):
+        update_frame(df.iloc[:stop], path, RESOLUTIONS)
+
+    one_shot = Rollups(list(df.columns), RESOLUTIONS)
+    one_shot.append(df.index, df.to_numpy())
+    assert_same_rollups(Rollups.load(path), one_shot)
+
+
+def test_levels_match_pandas_resampling(tmp_path):
+    df = sample_frame()
+    path = tmp_path / "series.rollups"
+    update_frame(df, path, RESOLUTIONS)
+    rollups = Rollups.load(path)
+
+    for i, resolution in enumerate(RESOLUTIONS):
+        result = rollups.query(level=i)
+        grouped = df.groupby(df.index // resolution * resolution)
+        np.testing.assert_array_equal(result["time"], grouped.size().index)
+        np.testing.assert_array_equal(result["count"], grouped.count().to_numpy())
+        np.testing.assert_allclose(result["min"], grouped.min().to_numpy(), rtol=1e-6)
+        np.testing.assert_allclose(result["max"], grouped.max().to_numpy(), rtol=1e-6)
+        np.testing.assert_allclose(result["mean"], grouped.mean().to_numpy())
+
+
+def test_datetime_index_is_rolled_up_in_epoch_seconds(tmp_path):
+    df = sample_frame(steps=500)
+    stamped = df.set_axis(pd.to_datetime(df.index, unit="s"))
+    update_frame(stamped, tmp_path / "dt.rollups", RESOLUTIONS)
+    update_frame(df, tmp_path / "s.rollups", RESOLUTIONS)
+    assert_same_rollups(Rollups.load(tmp_path / "dt.rollups"), Rollups.load(tmp_path / "s.rollups"))
+
+
+def test_non_integer_index_is_rejected(tmp_path):
+    df = sample_frame(steps=10)
+    with pytest.raises(TypeError):
+        update_frame(df.set_axis(df.index + 0.5), tmp_path / "f.rollups", RESOLUTIONS)
+
+
+def test_series_mismatch_needs_rebuild(tmp_path):
+    df = sample_frame(steps=100)
+    path = tmp_path / "series.rollups"
+    update_frame(df, path, RESOLUTIONS)
+    renamed = df.rename(columns={"c": "d"})
+    with pytest.raises(ValueError):
+        update_frame(renamed, path, RESOLUTIONS)
+    assert Rollups.load(path).series.tolist() == ["a", "b", "c"]
+
+    assert update_frame(renamed, path, RESOLUTIONS, rebuild=True).series.tolist() == ["a", "b", "d"]
+
+
+def test_save_only_replaces_rollup_directories(tmp_path):
+    df = sample_frame(steps=100)
+    other = tmp_path / "results"
+    other.mkdir()
+    (other / "keep.csv").write_text("x\n")
+    with pytest.raises(FileExistsError):
+        update_frame(df, other, RESOLUTIONS)
+    assert (other / "keep.csv").exists()
+
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    update_frame(df, empty, RESOLUTIONS)
+    assert (empty / STATE_FILE).exists()
+
+
+def test_open_drops_records_after_an_interrupted_save(tmp_path):
+    df = sample_frame(steps=1000)
+    path = tmp_path / "series.rollups"
+    update_frame(df.iloc[:600], path, RESOLUTIONS)
+    with open(path / "level0.bin", "ab") as f:
+        f.write(b"\x00" * 100)
+    update_frame(df, path, RESOLUTIONS)
+
+    one_shot = Rollups(list(df.columns), RESOLUTIONS)
+    one_shot.append(df.index, df.to_numpy())
+    assert_same_rollups(Rollups.load(path), one_shot)